@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Backfill Slack notifications for tasks completed during a time range
+Run after downtime: missed completions are queued in the durable outbox and
+delivered under Slack's rate limits, optionally as per-project summaries
+"""
+
+import argparse
+import asyncio
+import logging
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from mrkdwn import escape
+from routing import channels_for
+from slack_client import SlackAPIError
+from timeutil import from_epoch_ms, parse_timestamp, to_epoch_ms
+
+logger = logging.getLogger(__name__)
+
+RELATIVE_TIME = re.compile(r"^(\d+)([mhd])$")
+UNITS = {"m": "minutes", "h": "hours", "d": "days"}
+
+# Lines per summary message, well under Slack's message size limit
+SUMMARY_LINES = 40
+
+
+def parse_time(value: str, now: datetime) -> datetime:
+    """Parse an ISO 8601 time or a relative one like 90m, 6h or 2d (before now)"""
+    match = RELATIVE_TIME.match(value.strip())
+    if match:
+        return now - timedelta(**{UNITS[match.group(2)]: int(match.group(1))})
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.astimezone()
+    return parsed
+
+
+def format_project_summaries(tasks: List[Dict], since: datetime, until: datetime) -> Dict[str, str]:
+    """One summary message per project, keyed by project name"""
+    by_project = {}
+    for task in tasks:
+        project = (task.get('project') or {}).get('name', 'No project')
+        by_project.setdefault(project, []).append(task)
+
+    window = f"{since.astimezone(timezone.utc):%b %d %H:%M} – {until.astimezone(timezone.utc):%b %d %H:%M} UTC"
+    messages = {}
+    for project, project_tasks in sorted(by_project.items()):
+        project_tasks.sort(key=lambda task: task.get('completedTime') or '')
+        message = f"📦 *{len(project_tasks)} tasks completed in {escape(project)}* ({window})\n"
+        for task in project_tasks[:SUMMARY_LINES]:
+            message += f"• {escape(task.get('name') or 'Unnamed task')}\n"
+        if len(project_tasks) > SUMMARY_LINES:
+            message += f"…and {len(project_tasks) - SUMMARY_LINES} more"
+        messages[project] = message
+    return messages
+
+
+async def collect_completions(integration, workspace_id: str, since: datetime, until: datetime,
+                              semaphore: asyncio.Semaphore, record: bool = True) -> List[Dict]:
+    """Fetch a workspace's tasks completed in [since, until)
+
+    Pages through every resolved task rather than stopping at the first page
+    without recent completions, since a backfill should not rely on ordering.
+    With ``record`` the completions in range also update the task snapshot,
+    so the regular poll doesn't detect them again.
+    """
+    from main import TASK_FIELDS
+
+    start, end = to_epoch_ms(since), to_epoch_ms(until)
+    found = []
+    async with semaphore:
+        statuses = await integration.motion.get_resolved_statuses_async(workspace_id)
+        pages = integration.motion.aiter_task_pages(
+            workspace_id=workspace_id,
+            statuses=statuses or None,
+            include_all_statuses=True,
+            fields=TASK_FIELDS
+        )
+        async for page in pages:
+            in_range = []
+            for task in page:
+                completed = parse_timestamp(task.get('completedTime'))
+                if task.get('completed') and completed is not None and start <= completed < end:
+                    in_range.append(task)
+            if record and in_range:
+                # Only what this run queues: completions outside the range are left for
+                # the service to detect and post
+                await asyncio.to_thread(integration.store.diff, workspace_id, in_range, bootstrapping=False)
+            found.extend(in_range)
+    logger.info(f"Workspace {workspace_id}: {len(found)} tasks completed in range")
+    return found
+
+
+async def deliver_summaries(integration, channel: str, items, since: datetime, until: datetime):
+    """Post one summary per project for a channel's backlog and settle the outbox rows"""
+    by_project = {}
+    for item in items:
+        by_project.setdefault((item.task.get('project') or {}).get('name', 'No project'), []).append(item)
+    messages = format_project_summaries([item.task for item in items], since, until)
+
+    for project, project_items in by_project.items():
+        if not integration.claim('delivery'):
+            logger.warning(f"Lost the delivery lease, leaving the rest of {channel} to its new owner")
+            return
+        ids = [item.id for item in project_items]
+        try:
+            await integration.slack.post_message_async(channel, messages[project])
+            integration.queue.mark_delivered(ids)
+            integration.record_delivered(project_items)
+        except Exception as e:
+            permanent = isinstance(e, SlackAPIError) and e.permanent
+            if integration.queue.mark_failed(ids, str(e), permanent=permanent):
+                logger.error(f"Giving up on the {project} summary for {channel}: {e}")
+            else:
+                logger.error(f"Error posting {project} summary to {channel}, will retry: {e}")
+
+
+async def backfill(integration, workspace_ids: List[str], since: datetime, until: datetime,
+                   concurrency: int, summary_threshold: Optional[int], queue_only: bool,
+                   dry_run: bool) -> Dict[str, int]:
+    """Queue and deliver every completion in the range; returns counts per channel"""
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*(
+        collect_completions(integration, workspace_id, since, until, semaphore, record=not dry_run)
+        for workspace_id in workspace_ids
+    ))
+
+    per_channel = {}
+    # Dedupe keys of the rows this run queued; only these are summarized
+    queued = set()
+    for workspace_id, tasks in zip(workspace_ids, results):
+        routes = integration.workspaces[workspace_id]
+        for task in tasks:
+            for channel in channels_for(task, routes):
+                if integration.state.is_delivered(integration.queue.dedupe_key(channel, task)):
+                    # Already posted, even if its outbox row has since been purged
+                    continue
+                if dry_run or integration.queue.enqueue(channel, task):
+                    queued.add(integration.queue.dedupe_key(channel, task))
+                    per_channel[channel] = per_channel.get(channel, 0) + 1
+
+        # Advance the watermark as a poll would, but never past the range covered
+        # here nor backwards
+        latest = integration.store.latest_completed_epoch(workspace_id)
+        if not dry_run and latest:
+            last_checked = integration.load_state(workspace_id)
+            integration.save_state(workspace_id, max(min(from_epoch_ms(latest), until), last_checked))
+
+    if dry_run or queue_only:
+        return per_channel
+
+    if not integration.slack.breaker.available():
+        print("⚠️  Slack circuit open: notifications stay queued for the service to deliver")
+        return per_channel
+    if not integration.claim('delivery'):
+        print("ℹ️  Another process holds the delivery lease and will deliver the queued notifications")
+        return per_channel
+
+    try:
+        if summary_threshold is not None:
+            by_channel = {}
+            for item in integration.queue.due(limit=100000):
+                if integration.queue.dedupe_key(item.channel, item.task) in queued:
+                    by_channel.setdefault(item.channel, []).append(item)
+            await asyncio.gather(*(
+                deliver_summaries(integration, channel, items, since, until)
+                for channel, items in by_channel.items()
+                if len(items) > summary_threshold
+            ))
+
+        # Whatever is left goes through the regular path (digests above DIGEST_THRESHOLD)
+        while integration.queue.due():
+            before = integration.queue.depth()
+            await integration.deliver_pending()
+            if integration.queue.depth() >= before:
+                break
+    finally:
+        if integration.leases:
+            # Hand delivery back to the service at once rather than after LEASE_TTL
+            integration.leases.release('delivery')
+    return per_channel
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Queue and deliver Slack notifications for tasks completed in a time range"
+    )
+    parser.add_argument("--since", required=True,
+                        help="Start of the range: ISO 8601 time or relative like 6h, 2d")
+    parser.add_argument("--until", help="End of the range (default: now)")
+    parser.add_argument("--workspace", action="append",
+                        help="Workspace ID to backfill (repeatable; default: all routed workspaces)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Workspaces fetched at once (Motion requests are still rate limited)")
+    parser.add_argument("--summarize", action="store_true",
+                        help="Collapse large catch-ups into one message per project")
+    parser.add_argument("--summary-threshold", type=int, default=10,
+                        help="With --summarize, channels with more completions than this get summaries")
+    parser.add_argument("--queue-only", action="store_true",
+                        help="Only queue notifications and leave delivery to the running service")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be sent without sending")
+    args = parser.parse_args()
+
+    # Imported late so --help and argument errors don't load the whole service
+    from dotenv import load_dotenv
+    from environment import validate_environment
+    from main import MotionSlackIntegration, configure_logging
+
+    load_dotenv()
+    configure_logging()
+    validate_environment()
+
+    now = datetime.now(timezone.utc)
+    try:
+        since = parse_time(args.since, now)
+        until = parse_time(args.until, now) if args.until else now
+    except ValueError as e:
+        print(f"❌ Invalid time: {e}")
+        sys.exit(1)
+    if since >= until:
+        print("❌ --since must be before --until")
+        sys.exit(1)
+
+    integration = MotionSlackIntegration()
+    workspace_ids = args.workspace or list(integration.workspaces)
+    unknown = [workspace_id for workspace_id in workspace_ids if workspace_id not in integration.workspaces]
+    if unknown:
+        print(f"❌ Workspaces without routes: {', '.join(unknown)}")
+        sys.exit(1)
+
+    print(f"🔁 Backfilling completions from {since.isoformat()} to {until.isoformat()}...")
+    try:
+        per_channel = asyncio.run(backfill(
+            integration, workspace_ids, since, until,
+            concurrency=max(args.concurrency, 1),
+            summary_threshold=args.summary_threshold if args.summarize else None,
+            queue_only=args.queue_only,
+            dry_run=args.dry_run
+        ))
+    except Exception as e:
+        # A failed page aborts the scan; nothing past it was queued or recorded
+        print(f"❌ Backfill aborted: {e}")
+        print("Completions queued before the failure will still be delivered; rerun to finish")
+        sys.exit(1)
+
+    if not per_channel:
+        print("✅ Nothing to backfill")
+        return
+    verb = "Would send" if args.dry_run else "Queued"
+    for channel, count in sorted(per_channel.items()):
+        print(f"   {verb} {count} completion(s) to {channel}")
+    if not args.dry_run:
+        print(f"📬 Still pending in the outbox: {integration.queue.depth()}")
+
+
+if __name__ == "__main__":
+    main()
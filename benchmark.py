@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the polling and delivery paths
+Runs MotionSlackIntegration against a local stand-in for the Motion and Slack
+APIs, so no credentials are needed and results are repeatable
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from urllib.request import Request, urlopen
+
+WORKSPACE_ID = "bench-workspace"
+CHANNEL = "#bench"
+
+# Cold-start budgets in milliseconds on top of a bare interpreter's startup
+STARTUP_BUDGETS = (
+    ("cli.py --help", ["cli.py", "--help"], 50),
+    ("cli.py check --offline", ["cli.py", "check", "--offline"], 100),
+    ("import main", ["-c", "import main"], 300),
+)
+
+STATUSES = [
+    {"name": "Todo", "isDefaultStatus": True, "isResolvedStatus": False},
+    {"name": "Backlog", "isDefaultStatus": False, "isResolvedStatus": False},
+    {"name": "In Progress", "isDefaultStatus": False, "isResolvedStatus": False},
+    {"name": "Blocked", "isDefaultStatus": False, "isResolvedStatus": False},
+    {"name": "Completed", "isDefaultStatus": False, "isResolvedStatus": True},
+]
+OPEN_STATUSES = STATUSES[:-1]
+
+
+class FakeAPI:
+    """In-memory Motion workspace and Slack channel behind one HTTP server"""
+
+    def __init__(self, size, page_size=100, latency=0.0, rate_limit_every=0):
+        self.page_size = page_size
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        created = "2024-01-01T09:00:00.000Z"
+        self.tasks = [
+            {
+                "id": f"task-{i}",
+                "name": f"Benchmark task {i}",
+                "description": f"<p>Step <b>{i}</b> of the <a href=\"https://example.com/{i}\">plan</a></p>",
+                "duration": 30 + i % 90,
+                "priority": ("ASAP", "HIGH", "MEDIUM", "LOW")[i % 4],
+                "completed": False,
+                "completedTime": None,
+                "createdTime": created,
+                "updatedTime": created,
+                "status": OPEN_STATUSES[i % len(OPEN_STATUSES)],
+                "project": {"id": f"project-{i % 25}", "name": f"Project {i % 25}"},
+                "labels": [],
+                "workspace": {"id": WORKSPACE_ID, "name": "Benchmark"},
+                "creator": {"id": "user-1", "name": "Bench", "email": "bench@example.com"},
+                "assignees": [{"id": "user-1", "name": "Bench", "email": "bench@example.com"}],
+            }
+            for i in range(size)
+        ]
+        self.motion_requests = 0
+        self.rate_limited = 0
+        self.posts = 0
+
+    def complete(self, count):
+        """Mark the first ``count`` open tasks as completed now"""
+        now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        done = 0
+        for task in self.tasks:
+            if done >= count:
+                break
+            if not task["completed"]:
+                task.update(completed=True, completedTime=now, updatedTime=now, status=STATUSES[-1])
+                done += 1
+        return done
+
+    def list_tasks(self, query):
+        statuses = query.get("status")
+        tasks = self.tasks
+        if statuses:
+            tasks = [task for task in tasks if task["status"]["name"] in statuses]
+        page_size = int(query.get("limit", [self.page_size])[0])
+        offset = int(query.get("cursor", ["0"])[0])
+        end = offset + page_size
+        return {
+            "tasks": tasks[offset:end],
+            "meta": {"nextCursor": str(end) if end < len(tasks) else None, "pageSize": page_size},
+        }
+
+    def handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; don't let Nagle stall the body
+            disable_nagle_algorithm = True
+
+            def _send(self, status, payload, headers=None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == "/_bench/stats":
+                    self._send(200, {
+                        "motion_requests": api.motion_requests,
+                        "rate_limited": api.rate_limited,
+                        "posts": api.posts,
+                    })
+                    return
+
+                api.motion_requests += 1
+                if api.latency:
+                    time.sleep(api.latency)
+                if api.rate_limit_every and api.motion_requests % api.rate_limit_every == 0:
+                    api.rate_limited += 1
+                    self._send(429, {"message": "rate limited"}, {"Retry-After": "1"})
+                elif url.path == "/v1/tasks":
+                    self._send(200, api.list_tasks(query))
+                elif url.path == "/v1/statuses":
+                    self._send(200, STATUSES)
+                else:
+                    self._send(404, {"message": "not found"})
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if url.path == "/_bench/complete":
+                    count = int(parse_qs(url.query).get("count", ["0"])[0])
+                    self._send(200, {"completed": api.complete(count)})
+                elif url.path == "/api/chat.postMessage":
+                    if api.latency:
+                        time.sleep(api.latency)
+                    api.posts += 1
+                    channel = json.loads(body or b"{}").get("channel")
+                    self._send(200, {"ok": True, "channel": channel, "ts": f"{time.time():.6f}"})
+                else:
+                    self._send(404, {"ok": False, "error": "unknown_method"})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def serve(size, page_size, latency, rate_limit_every, port_queue):
+    """Run a FakeAPI server; meant to be the target of a separate process"""
+    api = FakeAPI(size, page_size, latency, rate_limit_every)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), api.handler())
+    httpd.daemon_threads = True
+    port_queue.put(httpd.server_address[1])
+    httpd.serve_forever()
+
+
+def call(base, path, method="GET"):
+    with urlopen(Request(f"{base}{path}", method=method, data=b"" if method == "POST" else None)) as response:
+        return json.loads(response.read())
+
+
+def measure(base, action, trace=False):
+    """Run an action and return its duration, Motion requests, 429s and peak memory"""
+    before = call(base, "/_bench/stats")
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    action()
+    elapsed = time.perf_counter() - started
+    peak = None
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    after = call(base, "/_bench/stats")
+    return {
+        "seconds": elapsed,
+        "requests": after["motion_requests"] - before["motion_requests"],
+        "rate_limited": after["rate_limited"] - before["rate_limited"],
+        "posts": after["posts"] - before["posts"],
+        "peak_mb": peak / 1024 / 1024 if peak is not None else None,
+    }
+
+
+def run_size(size, args):
+    """Benchmark one workspace size and return its measurements"""
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=serve,
+        args=(size, args.page_size, args.latency / 1000, args.rate_limit_every, port_queue),
+        daemon=True
+    )
+    server.start()
+    base = f"http://127.0.0.1:{port_queue.get(timeout=60)}"
+
+    workdir = tempfile.mkdtemp(prefix="motion-bench-")
+    os.chdir(workdir)
+    os.environ.update({
+        "MOTION_API_URL": f"{base}/v1",
+        "SLACK_API_URL": f"{base}/api",
+        "TASK_DB": os.path.join(workdir, "tasks.db"),
+        "OUTBOX_DB": os.path.join(workdir, "outbox.db"),
+    })
+
+    # Imported late: the benchmark's environment has to be in place first
+    import main
+    from rate_limiter import RateLimiter
+
+    integration = main.MotionSlackIntegration()
+    # Measure the code rather than the configured quotas: an empty limiter never waits
+    if not args.rate_limits:
+        unlimited = RateLimiter()
+        integration.rate_limiter = integration.motion.rate_limiter = integration.slack.rate_limiter = unlimited
+    integration.digest_threshold = args.completions
+
+    try:
+        results = {"size": size}
+        results["bootstrap"] = measure(base, integration.check_for_completed_tasks)
+        call(base, f"/_bench/complete?count={args.completions}", "POST")
+        results["incremental"] = measure(base, integration.check_for_completed_tasks)
+        integration.last_full_scan.clear()
+        results["reconcile"] = measure(base, integration.check_for_completed_tasks)
+        results["delivery"] = measure(base, lambda: asyncio.run(integration.deliver_pending()))
+        integration.last_full_scan.clear()
+        results["memory"] = measure(base, integration.check_for_completed_tasks, trace=True)
+        return results
+    finally:
+        integration.store.close()
+        integration.queue.close()
+        server.terminate()
+        server.join()
+
+
+def measure_startup(runs):
+    """Median startup of each budgeted command, less that of a bare interpreter"""
+    root = os.path.dirname(os.path.abspath(__file__))
+
+    def median_ms(args):
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, *args], cwd=root, stdout=subprocess.DEVNULL, check=True)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings) * 1000
+
+    interpreter = median_ms(["-c", "pass"])
+    results = [{"command": "python -c pass", "ms": interpreter, "overhead_ms": 0.0, "budget_ms": None}]
+    for name, args, budget in STARTUP_BUDGETS:
+        elapsed = median_ms(args)
+        results.append({"command": name, "ms": elapsed, "overhead_ms": elapsed - interpreter, "budget_ms": budget})
+    return results
+
+
+def report_startup(results):
+    print()
+    print(f"{'command':<24} {'ms':>7} {'overhead':>9} {'budget':>7}")
+    for row in results:
+        budget = f"{row['budget_ms']}" if row["budget_ms"] is not None else "-"
+        over = " ❌" if row["budget_ms"] is not None and row["overhead_ms"] > row["budget_ms"] else ""
+        print(f"{row['command']:<24} {row['ms']:>7.0f} {row['overhead_ms']:>9.0f} {budget:>7}{over}")
+
+
+def report(all_results):
+    print()
+    print(f"{'tasks':>8} {'phase':<12} {'seconds':>9} {'requests':>9} {'429s':>5} {'msgs/sec':>9} {'peak MB':>8}")
+    for results in all_results:
+        for phase in ("bootstrap", "incremental", "reconcile", "delivery", "memory"):
+            row = results[phase]
+            rate = f"{row['posts'] / row['seconds']:.1f}" if row["posts"] and row["seconds"] else "-"
+            peak = f"{row['peak_mb']:.1f}" if row["peak_mb"] is not None else "-"
+            print(
+                f"{results['size']:>8} {phase:<12} {row['seconds']:>9.3f} {row['requests']:>9} "
+                f"{row['rate_limited']:>5} {rate:>9} {peak:>8}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark polling and delivery against a local fake API")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="Comma-separated workspace sizes (tasks)")
+    parser.add_argument("--page-size", type=int, default=100, help="Tasks per /tasks page")
+    parser.add_argument("--latency", type=float, default=0, help="Added latency per request (ms)")
+    parser.add_argument("--rate-limit-every", type=int, default=0,
+                        help="Answer every Nth Motion request with 429 (0 disables)")
+    parser.add_argument("--completions", type=int, default=100,
+                        help="Tasks completed between the bootstrap and incremental polls")
+    parser.add_argument("--rate-limits", action="store_true",
+                        help="Keep the configured client-side rate limits")
+    parser.add_argument("--startup", action="store_true",
+                        help="Measure cold start against its budgets instead; exits 1 if one is exceeded")
+    parser.add_argument("--startup-runs", type=int, default=10, help="Runs per command with --startup")
+    parser.add_argument("--json", action="store_true", help="Print raw results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Keep the integration's INFO logging")
+    args = parser.parse_args()
+
+    os.environ.setdefault("MOTION_API_KEY", "benchmark")
+    os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-benchmark")
+    os.environ["MOTION_WORKSPACE_ID"] = WORKSPACE_ID
+    os.environ["SLACK_CHANNEL"] = CHANNEL
+    os.environ.pop("ROUTES_FILE", None)
+    os.environ.pop("MOTION_CACHE_DB", None)
+
+    if args.startup:
+        results = measure_startup(args.startup_runs)
+        if args.json:
+            print(json.dumps(results, indent=2))
+        else:
+            report_startup(results)
+        sys.exit(int(any(row["budget_ms"] is not None and row["overhead_ms"] > row["budget_ms"] for row in results)))
+
+    import main as integration_main
+    integration_main.configure_logging()
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    all_results = []
+    for size in (int(value) for value in args.sizes.split(",") if value.strip()):
+        print(f"⏱️  Benchmarking {size} tasks...", file=sys.stderr)
+        all_results.append(run_size(size, args))
+
+    if args.json:
+        print(json.dumps(all_results, indent=2))
+    else:
+        report(all_results)
+
+
+if __name__ == "__main__":
+    main()
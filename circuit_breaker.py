@@ -0,0 +1,122 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} circuit is open; next probe in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Stops calling an upstream after repeated failures until a probe succeeds
+
+    ``failure_threshold`` consecutive failures open the circuit. While open,
+    calls fail immediately with CircuitOpenError. After ``reset_timeout``
+    seconds one probe call is let through (half-open): success closes the
+    circuit, failure opens it again for another ``reset_timeout``.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def _retry_in(self, now: float) -> float:
+        return max(self.opened_at + self.reset_timeout - now, 0.0)
+
+    def allow(self):
+        """Permit one call or raise CircuitOpenError"""
+        with self.lock:
+            if self.state == CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == OPEN and self._retry_in(now) == 0:
+                self.state = HALF_OPEN
+                self.probing = False
+                logger.info(f"{self.name} circuit half-open, probing")
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return
+            raise CircuitOpenError(self.name, self._retry_in(now) if self.state == OPEN else 0.0)
+
+    def available(self) -> bool:
+        """Whether a call would currently be let through, without claiming it"""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                return self._retry_in(time.monotonic()) == 0
+            return not self.probing
+
+    def record_success(self):
+        with self.lock:
+            if self.state != CLOSED:
+                logger.info(f"{self.name} circuit closed")
+            self.state = CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(
+                        f"{self.name} circuit open after {self.failures} failures; "
+                        f"pausing calls for {self.reset_timeout:.0f}s"
+                    )
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+    def snapshot(self) -> Dict:
+        """Current state for health checks and metrics"""
+        with self.lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "retry_in": round(self._retry_in(time.monotonic()), 1) if self.state == OPEN else 0.0,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Process-wide breaker for an upstream, configured from the environment"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=int(os.environ.get('BREAKER_FAILURES', 5)),
+                reset_timeout=float(os.environ.get('BREAKER_RESET_TIMEOUT', 60))
+            )
+        return breaker
+
+
+def breaker_states() -> Dict[str, Dict]:
+    """Snapshot of every breaker in use"""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.snapshot() for name, breaker in breakers.items()}
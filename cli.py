@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Command line entry point for the Motion-Slack integration
+Each subcommand imports only what it needs, so one-shot invocations (checks,
+cron-style backfills, restarts) don't pay for the whole service at startup
+"""
+
+import argparse
+import os
+import sys
+
+
+def load_env():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+def run(args):
+    import main
+    main.main()
+
+
+def find_workspace(args):
+    load_env()
+    import find_workspace_id
+    find_workspace_id.main()
+
+
+def check(args):
+    """Validate the configuration and, unless offline, the Motion and Slack credentials"""
+    load_env()
+    from environment import missing_environment, routes_from_env
+    from routing import group_by_workspace
+
+    missing = missing_environment()
+    if missing:
+        print(f"❌ Missing required environment variables: {', '.join(missing)}")
+        return 1
+    try:
+        routes = routes_from_env()
+    except Exception as e:
+        print(f"❌ Invalid routes: {e}")
+        return 1
+    workspace_ids = list(group_by_workspace(routes))
+    print(f"✅ {len(routes)} route(s) for {len(workspace_ids)} workspace(s)")
+    if args.offline:
+        return 0
+
+    from motion_client import MotionClient
+    from slack_client import SlackClient
+
+    motion = MotionClient(os.environ['MOTION_API_KEY'])
+    user_info = motion.get_user_info()
+    if not user_info:
+        print("❌ Motion API key was rejected")
+        return 1
+    print(f"✅ Motion user: {user_info.get('name')} ({user_info.get('email')})")
+    accessible = {workspace.get('id') for workspace in motion.get_workspaces()}
+    inaccessible = [workspace_id for workspace_id in workspace_ids if workspace_id not in accessible]
+    if inaccessible:
+        print(f"❌ Workspaces not accessible with this key: {', '.join(inaccessible)}")
+        return 1
+    print("✅ All routed workspaces are accessible")
+    if not SlackClient(os.environ['SLACK_BOT_TOKEN']).test_auth():
+        print("❌ Slack bot token was rejected")
+        return 1
+    print("✅ Slack bot token is valid")
+    return 0
+
+
+def passthrough(module_name):
+    """Run a script's own main() with the remaining arguments as its argv"""
+    def command(args):
+        load_env()
+        module = __import__(module_name)
+        sys.argv = [f"{sys.argv[0]} {args.command}"] + args.args
+        return module.main()
+    return command
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Post completed Motion tasks to Slack")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    subparsers.required = True
+
+    subparsers.add_parser("run", help="Run the service (the default for python main.py)").set_defaults(func=run)
+    subparsers.add_parser("find-workspace", help="List the workspaces your Motion API key can access") \
+        .set_defaults(func=find_workspace)
+    check_parser = subparsers.add_parser("check", help="Validate configuration and credentials, then exit")
+    check_parser.add_argument("--offline", action="store_true",
+                              help="Only validate the environment and routes, without calling the APIs")
+    check_parser.set_defaults(func=check)
+    # Arguments are left to the scripts' own parsers: see `cli.py backfill --help`
+    for name, module_name, help_text in (
+        ("backfill", "backfill", "Queue notifications for tasks completed during a time range"),
+        ("bench", "benchmark", "Benchmark polling and delivery against a local fake API"),
+    ):
+        subparsers.add_parser(name, help=help_text, add_help=False) \
+            .set_defaults(func=passthrough(module_name), passthrough=True)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra and not getattr(args, "passthrough", False):
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    args.args = extra
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+import json
+import time
+import logging
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from fast_json import plain
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Delivery:
+    """A queued notification for one task in one channel"""
+    id: int
+    channel: str
+    task_id: str
+    task: Dict
+    attempts: int
+    created_at: float
+
+
+class DeliveryQueue:
+    """Durable outbox of Slack notifications awaiting delivery
+
+    Rows are written with ``synchronous=FULL`` so a queued notification
+    survives a crash, and each row carries a dedupe key so detecting the
+    same completion twice only delivers it once. Rows that fail permanently
+    or ``max_attempts`` times are parked with their last error instead of
+    being retried forever.
+    """
+
+    def __init__(self, path: str = "outbox.db", base_backoff: float = 5,
+                 max_backoff: float = 600, max_attempts: int = 50):
+        self.path = path
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                dedupe_key TEXT NOT NULL UNIQUE,
+                channel TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                task TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                delivered_at REAL,
+                last_error TEXT,
+                parked_at REAL
+            )
+        """)
+        self._migrate()
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_outbox_pending "
+            "ON outbox (delivered_at, next_attempt_at)"
+        )
+        self.conn.commit()
+
+    def _migrate(self):
+        """Add the parked_at column to outboxes created before it existed"""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(outbox)")}
+        if "parked_at" not in columns:
+            self.conn.execute("ALTER TABLE outbox ADD COLUMN parked_at REAL")
+
+    @staticmethod
+    def dedupe_key(channel: str, task: Dict) -> str:
+        """Key identifying one completion of one task in one channel"""
+        return f"{task.get('id')}:{task.get('completedTime') or ''}:{channel}"
+
+    def enqueue(self, channel: str, task: Dict) -> bool:
+        """Queue a task for a channel; returns False if it was already queued"""
+        now = time.time()
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO outbox (dedupe_key, channel, task_id, task, "
+                "next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.dedupe_key(channel, task), channel, task.get('id'),
+                 json.dumps(plain(task)), now, now)
+            )
+        return cursor.rowcount == 1
+
+    def due(self, limit: int = 500, now: Optional[float] = None) -> List[Delivery]:
+        """Undelivered items whose next attempt is due, oldest first"""
+        now = time.time() if now is None else now
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, channel, task_id, task, attempts, created_at FROM outbox "
+                "WHERE delivered_at IS NULL AND parked_at IS NULL AND next_attempt_at <= ? "
+                "ORDER BY id LIMIT ?",
+                (now, limit)
+            ).fetchall()
+        return [
+            Delivery(id=row[0], channel=row[1], task_id=row[2], task=json.loads(row[3]),
+                     attempts=row[4], created_at=row[5])
+            for row in rows
+        ]
+
+    def mark_delivered(self, ids: List[int]):
+        """Record that the given items reached Slack"""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE outbox SET delivered_at = ?, last_error = NULL WHERE id = ?",
+                [(now, item_id) for item_id in ids]
+            )
+
+    def mark_failed(self, ids: List[int], error: str, permanent: bool = False):
+        """Schedule another attempt with exponential backoff, or park the items
+
+        Items are parked when the error is ``permanent`` or they have used up
+        ``max_attempts``; parked items keep their last error but are never
+        retried. Returns the ids that were parked.
+        """
+        now = time.time()
+        parked = []
+        with self.lock, self.conn:
+            for item_id in ids:
+                row = self.conn.execute(
+                    "SELECT attempts FROM outbox WHERE id = ?", (item_id,)
+                ).fetchone()
+                if row is None:
+                    continue
+                attempts = row[0] + 1
+                if permanent or attempts >= self.max_attempts:
+                    parked.append(item_id)
+                    self.conn.execute(
+                        "UPDATE outbox SET attempts = ?, parked_at = ?, last_error = ? WHERE id = ?",
+                        (attempts, now, error[:500], item_id)
+                    )
+                    continue
+                delay = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1))
+                self.conn.execute(
+                    "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                    (attempts, now + delay, error[:500], item_id)
+                )
+        return parked
+
+    def depth(self) -> int:
+        """Number of items still awaiting delivery"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE delivered_at IS NULL AND parked_at IS NULL"
+            ).fetchone()[0]
+
+    def parked(self) -> int:
+        """Number of items given up on"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE parked_at IS NOT NULL"
+            ).fetchone()[0]
+
+    def oldest_pending(self) -> Optional[float]:
+        """Creation time of the oldest item still awaiting delivery, if any"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT MIN(created_at) FROM outbox WHERE delivered_at IS NULL AND parked_at IS NULL"
+            ).fetchone()
+        return row[0] if row else None
+
+    def purge_delivered(self, older_than: float = 7 * 24 * 3600):
+        """Drop delivered items once they're too old to be re-detected"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM outbox WHERE delivered_at IS NOT NULL AND delivered_at < ?",
+                (time.time() - older_than,)
+            )
+
+    def close(self):
+        """Close the underlying database connection"""
+        self.conn.close()
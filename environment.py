@@ -0,0 +1,42 @@
+import os
+import sys
+import logging
+from typing import List
+
+from routing import Route, load_routes
+
+logger = logging.getLogger(__name__)
+
+# Kept free of the API clients and storage so one-shot commands can check the
+# configuration without importing the whole service
+
+
+def missing_environment() -> List[str]:
+    """Names of required environment variables that are not set"""
+    required_vars = ['MOTION_API_KEY', 'SLACK_BOT_TOKEN']
+    if not os.environ.get('ROUTES_FILE'):
+        # A routes file names its own workspaces
+        required_vars.append('MOTION_WORKSPACE_ID')
+    return [var for var in required_vars if not os.environ.get(var)]
+
+
+def validate_environment():
+    """Exit with a description of the environment if required variables are missing"""
+    missing_vars = missing_environment()
+    if missing_vars:
+        logger.error(f"Missing required environment variables: {', '.join(missing_vars)}")
+        logger.error("Please set these variables in Railway or create a .env file")
+        logger.error("Current environment variables:")
+        for key in sorted(os.environ.keys()):
+            if not key.startswith('_'):
+                logger.error(f"  {key}: {'***' if any(secret in key.upper() for secret in ['KEY', 'TOKEN', 'SECRET']) else os.environ[key][:20] + '...' if len(os.environ[key]) > 20 else os.environ[key]}")
+        sys.exit(1)
+
+
+def routes_from_env() -> List[Route]:
+    """Routes from ROUTES_FILE, or the single MOTION_WORKSPACE_ID/SLACK_CHANNEL route"""
+    return load_routes(
+        os.environ.get('ROUTES_FILE'),
+        os.environ.get('MOTION_WORKSPACE_ID'),
+        os.environ.get('SLACK_CHANNEL', '#dev-rel')
+    )
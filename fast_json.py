@@ -0,0 +1,165 @@
+import os
+import json
+import logging
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def _select_backend() -> str:
+    """Pick the decoder named by JSON_DECODER, or the fastest one installed"""
+    requested = os.environ.get('JSON_DECODER', 'auto').lower()
+    available = [name for name, module in (('msgspec', msgspec), ('orjson', orjson)) if module] + ['json']
+    if requested == 'auto':
+        return available[0]
+    if requested not in available:
+        logger.warning(f"JSON_DECODER={requested} is not installed, using {available[0]}")
+        return available[0]
+    return requested
+
+
+BACKEND = _select_backend()
+
+
+def loads(data: bytes) -> Any:
+    """Decode a JSON document with the fastest available decoder"""
+    if BACKEND == 'orjson' or (BACKEND == 'msgspec' and orjson):
+        return orjson.loads(data)
+    if BACKEND == 'msgspec':
+        return msgspec.json.decode(data)
+    return json.loads(data)
+
+
+class TaskRecord(Mapping):
+    """Read-only view of one task that only decodes what is read
+
+    The fields every poll inspects (id, completion state and times) live in
+    slots. The rest of the payload is decoded on first access, which only
+    happens for tasks that changed or get posted. Behaves like the task dict
+    it stands for, limited to ``fields`` when given.
+    """
+
+    __slots__ = ('id', 'completed', 'completed_time', 'updated_time', '_raw', '_payload', '_fields')
+
+    # Task keys served from slots without decoding the payload
+    HEAD = {'id': 'id', 'completed': 'completed', 'completedTime': 'completed_time',
+            'updatedTime': 'updated_time'}
+
+    def __init__(self, id: Optional[str] = None, completed: Optional[bool] = None,
+                 completed_time: Optional[str] = None, updated_time: Optional[str] = None,
+                 raw: Optional[bytes] = None, payload: Optional[Dict] = None,
+                 fields: Optional[Sequence[str]] = None):
+        self.id = id
+        self.completed = completed
+        self.completed_time = completed_time
+        self.updated_time = updated_time
+        self._raw = raw
+        self._payload = payload
+        self._fields = fields
+
+    @classmethod
+    def from_dict(cls, task: Dict, fields: Optional[Sequence[str]] = None) -> 'TaskRecord':
+        """Wrap an already decoded task"""
+        head = {slot: task.get(key) for key, slot in cls.HEAD.items() if fields is None or key in fields}
+        return cls(payload=task, fields=fields, **head)
+
+    @property
+    def payload(self) -> Dict:
+        """The full task, decoded and projected on first use"""
+        if self._raw is not None:
+            self._payload = loads(self._raw)
+            self._raw = None
+        if self._fields is not None:
+            self._payload = {key: self._payload[key] for key in self._fields if key in self._payload}
+            self._fields = None
+        return self._payload
+
+    def get(self, key: str, default: Any = None) -> Any:
+        slot = self.HEAD.get(key)
+        if slot is not None:
+            value = getattr(self, slot)
+            return default if value is None else value
+        return self.payload.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        slot = self.HEAD.get(key)
+        if slot is not None and getattr(self, slot) is not None:
+            return getattr(self, slot)
+        return self.payload[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.payload)
+
+    def __len__(self) -> int:
+        return len(self.payload)
+
+    def to_dict(self) -> Dict:
+        return dict(self.payload)
+
+    def __repr__(self) -> str:
+        return f"TaskRecord(id={self.id!r}, completed={self.completed!r})"
+
+
+def plain(task: Mapping) -> Dict:
+    """The dict behind a task, for serialising it with the json module"""
+    return task.payload if isinstance(task, TaskRecord) else task
+
+
+if msgspec:
+    class _TaskHead(msgspec.Struct):
+        id: Optional[str] = None
+        completed: Optional[bool] = None
+        completedTime: Optional[str] = None
+        updatedTime: Optional[str] = None
+
+    class _TaskPage(msgspec.Struct):
+        tasks: List[msgspec.Raw] = []
+        meta: Dict[str, Any] = {}
+
+    _page_decoder = msgspec.json.Decoder(_TaskPage)
+    _head_decoder = msgspec.json.Decoder(_TaskHead)
+
+
+def _msgspec_record(raw, fields: Optional[Sequence[str]]) -> TaskRecord:
+    # Raw views point into the page body; keep a compact copy per task instead
+    raw = bytes(raw)
+    try:
+        head = _head_decoder.decode(raw)
+    except msgspec.ValidationError:
+        # Unexpected types in a head field: decode this task the ordinary way
+        return TaskRecord.from_dict(loads(raw), fields)
+    values = {
+        slot: getattr(head, key) for key, slot in TaskRecord.HEAD.items()
+        if fields is None or key in fields
+    }
+    return TaskRecord(raw=raw, fields=fields, **values)
+
+
+def decode_task_page(data: bytes, fields: Optional[Sequence[str]] = None) -> Dict:
+    """Decode a /tasks response into {'tasks': [TaskRecord, ...], 'meta': {...}}
+
+    With msgspec only the head fields of each task are decoded up front and
+    the rest stays as raw JSON; otherwise the page is decoded in one go and
+    each task wrapped.
+    """
+    if BACKEND == 'msgspec':
+        try:
+            page = _page_decoder.decode(data)
+        except msgspec.ValidationError:
+            page = None
+        if page is not None:
+            return {'tasks': [_msgspec_record(raw, fields) for raw in page.tasks], 'meta': page.meta}
+    page = loads(data)
+    page['tasks'] = [TaskRecord.from_dict(task, fields) for task in page.get('tasks') or []]
+    return page
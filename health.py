@@ -0,0 +1,59 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Heartbeats:
+    """Deadlines by which each long-running loop must report progress again
+
+    A loop calls ``beat`` whenever it makes progress, saying how long it
+    expects to be quiet (e.g. while sleeping until the next poll). It counts
+    as stalled once that time plus ``stall_timeout`` passes without a beat.
+    """
+
+    def __init__(self, stall_timeout: float = 600):
+        self.stall_timeout = stall_timeout
+        self.beats = {}
+        self.lock = threading.Lock()
+
+    def beat(self, name: str, expect_within: float = 0.0):
+        now = time.monotonic()
+        with self.lock:
+            self.beats[name] = (now, now + expect_within + self.stall_timeout)
+
+    def overdue(self) -> Dict[str, float]:
+        """Seconds past its deadline for every stalled loop"""
+        now = time.monotonic()
+        with self.lock:
+            return {name: round(now - deadline, 1) for name, (_, deadline) in self.beats.items() if now > deadline}
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Time since each loop's last beat and whether it is stalled"""
+        now = time.monotonic()
+        with self.lock:
+            return {
+                name: {"last_beat_seconds_ago": round(now - last, 1), "stalled": now > deadline}
+                for name, (last, deadline) in self.beats.items()
+            }
+
+    def watch(self, interval: Optional[float] = None):
+        """Exit the process when a loop stalls, so the platform restarts it"""
+        interval = interval or min(30.0, self.stall_timeout / 4)
+
+        def run():
+            while True:
+                time.sleep(interval)
+                overdue = self.overdue()
+                if overdue:
+                    stalled = ', '.join(f"{name} ({seconds:.0f}s overdue)" for name, seconds in overdue.items())
+                    logger.critical(f"Watchdog: stalled loops {stalled}; exiting for a restart")
+                    logging.shutdown()
+                    os._exit(1)
+
+        thread = threading.Thread(target=run, name="watchdog", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached GET stays fresh, by endpoint prefix (longest prefix wins).
+# A TTL of 0 always revalidates with a conditional request.
+DEFAULT_TTLS = {
+    "/users/me": 3600,
+    "/users": 3600,
+    "/workspaces": 3600,
+    "/statuses": 3600,
+    "/projects": 900,
+    "/tasks/": 0,
+}
+
+
+@dataclass
+class CacheEntry:
+    """A cached response body with its validators"""
+    value: Any
+    expires_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+
+class MemoryCache:
+    """Thread-safe in-memory LRU of cache entries
+
+    Expired entries are kept until evicted so they can still be
+    revalidated with a conditional request.
+    """
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+
+class DiskCache:
+    """SQLite-backed cache that survives restarts and is shared by the scripts"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        # Worker processes share the file: wait for locks and let readers run alongside a writer
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS http_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                etag TEXT,
+                last_modified TEXT
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, expires_at, etag, last_modified FROM http_cache WHERE key = ?",
+                (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(json.loads(row[0]), row[1], row[2], row[3])
+
+    def set(self, key: str, entry: CacheEntry):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO http_cache (key, value, expires_at, etag, last_modified) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(entry.value), entry.expires_at, entry.etag, entry.last_modified)
+            )
+
+
+class HTTPCache:
+    """Response cache for slow-changing GET endpoints
+
+    Lookups go to the in-memory LRU first and then to the optional disk
+    backend. Stale entries carrying an ETag or Last-Modified are revalidated
+    with a conditional request instead of being refetched.
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, int]] = None, memory: Optional[MemoryCache] = None,
+                 disk: Optional[DiskCache] = None):
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.memory = memory or MemoryCache()
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+    @classmethod
+    def from_env(cls) -> 'HTTPCache':
+        """Build a cache, adding the disk tier when MOTION_CACHE_DB is set"""
+        path = os.environ.get('MOTION_CACHE_DB')
+        return cls(disk=DiskCache(path) if path else None)
+
+    def ttl_for(self, endpoint: str) -> Optional[int]:
+        """TTL for an endpoint, or None if it isn't cacheable"""
+        matches = [prefix for prefix in self.ttls if endpoint.startswith(prefix)]
+        if not matches:
+            return None
+        return self.ttls[max(matches, key=len)]
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.set(key, entry)
+        return entry
+
+    def set(self, key: str, entry: CacheEntry):
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            self.disk.set(key, entry)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit, miss and revalidation counts"""
+        return {"hits": self.hits, "misses": self.misses, "revalidated": self.revalidated}
@@ -0,0 +1,92 @@
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Handlers take the request body and headers and return (status, content type, body)
+Handler = Callable[[bytes, Dict[str, str]], Tuple[int, str, bytes]]
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+def json_response(status: int, payload: Dict) -> Tuple[int, str, bytes]:
+    """Build a JSON handler response"""
+    return status, "application/json", json.dumps(payload).encode("utf-8")
+
+
+class EmbeddedServer:
+    """Small threaded HTTP server for webhooks and operational endpoints"""
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 8080):
+        self.host = host
+        self.port = port
+        self.routes = {}
+        self.httpd = None
+        self.thread = None
+
+    def route(self, method: str, path: str, handler: Handler):
+        """Register a handler for a method and exact path"""
+        self.routes[(method.upper(), path)] = handler
+
+    def _make_handler(self):
+        """Build the request handler class bound to this server's routes"""
+        routes = self.routes
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            def _dispatch(self, method):
+                path = self.path.split("?", 1)[0]
+                handler = routes.get((method, path))
+                if handler is None:
+                    known_path = any(route_path == path for _, route_path in routes)
+                    self._send(*json_response(405 if known_path else 404, {"error": "not found"}))
+                    return
+
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > MAX_BODY_BYTES:
+                    self._send(*json_response(413, {"error": "payload too large"}))
+                    return
+                body = self.rfile.read(length) if length else b""
+
+                try:
+                    self._send(*handler(body, dict(self.headers)))
+                except Exception as e:
+                    logger.error(f"Error handling {method} {path}: {e}")
+                    self._send(*json_response(500, {"error": "internal error"}))
+
+            def _send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def log_message(self, format, *args):
+                logger.debug(f"{self.address_string()} - {format % args}")
+
+        return RequestHandler
+
+    def start(self):
+        """Start serving on a background thread"""
+        self.httpd = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self.httpd.daemon_threads = True
+        # Report the real port when started with port 0
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="http", daemon=True)
+        self.thread.start()
+        logger.info(f"HTTP server listening on {self.host}:{self.port}")
+
+    def stop(self):
+        """Stop serving and release the socket"""
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
@@ -0,0 +1,85 @@
+import os
+import time
+import socket
+import logging
+import sqlite3
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def default_owner(pid: Optional[int] = None) -> str:
+    """Identify a process, including its host so the owner names stay unambiguous"""
+    return f"{socket.gethostname()}:{pid or os.getpid()}"
+
+
+class LeaseStore:
+    """Time-limited named leases in SQLite, shared by the processes on one host
+
+    A lease is held by one owner until it expires or is released; holders
+    renew by acquiring again before ``ttl`` runs out. The database runs in
+    WAL mode, which SQLite does not support on network filesystems, so
+    leases only exclude processes on the same host.
+    """
+
+    def __init__(self, path: str = "leases.db", ttl: float = 120, owner: Optional[str] = None):
+        self.path = path
+        self.ttl = ttl
+        self.owner = owner or default_owner()
+        self.lock = threading.Lock()
+        # Autocommit mode so each acquire runs its own BEGIN IMMEDIATE transaction
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+
+    def acquire(self, name: str) -> bool:
+        """Take or renew a lease; False while another owner holds it"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT owner, expires_at FROM leases WHERE name = ?", (name,)
+                ).fetchone()
+                if row and row[0] != self.owner and row[1] > now:
+                    self.conn.execute("COMMIT")
+                    return False
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                    (name, self.owner, now + self.ttl)
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        if not row or row[0] != self.owner:
+            logger.info(f"Acquired lease {name}" + (f" (expired from {row[0]})" if row else ""))
+        return True
+
+    def release(self, name: str):
+        """Give up a lease so another owner can take it immediately"""
+        with self.lock:
+            self.conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, self.owner))
+
+    def release_all(self, owner: Optional[str] = None):
+        """Give up every lease held by this owner, or by a dead one sharing the file"""
+        with self.lock:
+            self.conn.execute("DELETE FROM leases WHERE owner = ?", (owner or self.owner,))
+
+    def holder(self, name: str) -> Optional[str]:
+        """Current unexpired owner of a lease, if any"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT owner FROM leases WHERE name = ? AND expires_at > ?", (name, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        self.conn.close()
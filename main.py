@@ -1,67 +1,178 @@
 import os
 import time
+import asyncio
 import json
 import logging
-from datetime import datetime, timezone
-from pathlib import Path
+import threading
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 
 from motion_client import MotionClient
-from slack_client import SlackClient
+from slack_client import SlackClient, SlackAPIError
+from task_store import TaskStore, COMPLETED, RECOMPLETED, REOPENED
+from routing import group_by_workspace, channels_for
+from rate_limiter import get_default_limiter
+from delivery_queue import DeliveryQueue
+from http_server import EmbeddedServer, json_response
+from webhooks import WebhookReceiver
+from scheduler import PollScheduler
+from mrkdwn import html_to_mrkdwn, escape
+from message_templates import TemplateRegistry
+from timeutil import parse_timestamp, from_epoch_ms
+from metrics import get_registry
+from state_store import open_state_backend
+from circuit_breaker import CircuitOpenError, breaker_states
+from leases import LeaseStore
+from health import Heartbeats
+from environment import validate_environment, routes_from_env
+
+logger = logging.getLogger(__name__)
+
+# Nothing runs at import time, so the integration can be imported for embedding
+# and tests; main() loads .env, configures logging and validates the environment
+
+
+def configure_logging():
+    """Log INFO and above to stderr in the service's format"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
 
-# Load environment variables from .env file
-load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Task keys kept from each /tasks page: enough to diff, route and format a task
+TASK_FIELDS = (
+    'id', 'name', 'description', 'duration', 'priority', 'completed', 'completedTime',
+    'updatedTime', 'status', 'project', 'labels', 'workspace'
 )
-logger = logging.getLogger(__name__)
 
-# Check for required environment variables
-required_vars = ['MOTION_API_KEY', 'MOTION_WORKSPACE_ID', 'SLACK_BOT_TOKEN']
-missing_vars = [var for var in required_vars if not os.environ.get(var)]
+# Pages and counts are small integers; lag spans seconds to hours
+PAGE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+LAG_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 21600, 86400)
 
-if missing_vars:
-    logger.error(f"Missing required environment variables: {', '.join(missing_vars)}")
-    logger.error("Please set these variables in Railway or create a .env file")
-    logger.error("Current environment variables:")
-    for key in sorted(os.environ.keys()):
-        if not key.startswith('_'):
-            logger.error(f"  {key}: {'***' if any(secret in key.upper() for secret in ['KEY', 'TOKEN', 'SECRET']) else os.environ[key][:20] + '...' if len(os.environ[key]) > 20 else os.environ[key]}")
-    exit(1)
+# Task lines listed in a digest; every project still gets its header
+DIGEST_LINES = 40
 
 class MotionSlackIntegration:
     def __init__(self):
-        self.motion = MotionClient(os.environ['MOTION_API_KEY'])
-        self.slack = SlackClient(os.environ['SLACK_BOT_TOKEN'])
-        self.workspace_id = os.environ['MOTION_WORKSPACE_ID']
-        self.channel = os.environ.get('SLACK_CHANNEL', '#dev-rel')
-        self.state_file = Path('state.json')
+        # One limiter paces every Motion and Slack call made by this process
+        self.rate_limiter = get_default_limiter()
+        self.motion = MotionClient(os.environ['MOTION_API_KEY'], rate_limiter=self.rate_limiter)
+        self.slack = SlackClient(os.environ['SLACK_BOT_TOKEN'], rate_limiter=self.rate_limiter)
+        self.routes = routes_from_env()
+        self.workspaces = group_by_workspace(self.routes)
+        # Upper bound on Slack posts in flight at once across all channels
+        self.max_concurrency = int(os.environ.get('MAX_CONCURRENCY', 8))
+        # Watermarks and delivery records; JSON with atomic writes, or SQLite
+        self.state = open_state_backend()
+        self.store = TaskStore(os.environ.get('TASK_DB', 'tasks.db'))
+        # Detected completions wait in a durable outbox until Slack accepts them
+        # Failed notifications are retried with backoff up to DELIVERY_MAX_ATTEMPTS times;
+        # permanent Slack errors (unknown channel, bot not invited...) park them at once
+        self.queue = DeliveryQueue(
+            os.environ.get('OUTBOX_DB', 'outbox.db'),
+            max_attempts=int(os.environ.get('DELIVERY_MAX_ATTEMPTS', 50))
+        )
+        self.delivery_interval = int(os.environ.get('DELIVERY_INTERVAL', 5))
+        # More than this many pending completions for one channel are sent as one digest
+        self.digest_threshold = int(os.environ.get('DIGEST_THRESHOLD', 5))
+        # With DIGEST_WINDOW a channel's completions are held until the oldest has waited
+        # that many seconds, then posted together as one digest
+        self.digest_window = int(os.environ.get('DIGEST_WINDOW', 0))
+        # DIGEST_THREADS=true replies to each digest with the full message of every task
+        self.digest_threads = os.environ.get('DIGEST_THREADS', 'false').lower() == 'true'
+        self.delivery_wakeup = threading.Event()
+        # 'text' posts the plain message; 'blocks' adds Block Kit from the templates
+        self.message_format = os.environ.get('MESSAGE_FORMAT', 'text').lower()
+        self.templates = TemplateRegistry.from_file(os.environ.get('TEMPLATES_FILE'))
+        self.delivery_thread = None
         self.poll_interval = int(os.environ.get('POLL_INTERVAL', 60))
+        # With webhooks enabled Motion pushes changes and polling becomes a slow reconciliation
+        self.webhook_secret = os.environ.get('WEBHOOK_SECRET')
+        if self.webhook_secret:
+            self.poll_interval = int(os.environ.get('WEBHOOK_POLL_INTERVAL', 900))
+        self.http_port = int(os.environ.get('HTTP_PORT') or os.environ.get('PORT') or 8080)
+        # Each workspace's interval adapts to activity between POLL_MIN_INTERVAL and
+        # POLL_MAX_INTERVAL; webhook mode keeps a fixed reconciliation interval
+        self.adaptive_polling = os.environ.get('ADAPTIVE_POLLING', 'true').lower() == 'true' and not self.webhook_secret
+        self.scheduler = PollScheduler.from_env(self.workspaces, self.poll_interval, adaptive=self.adaptive_polling)
+        # With LEASE_DB, workspaces and delivery are only handled while this process
+        # holds their lease, so processes on this host sharing the file never overlap
+        lease_db = os.environ.get('LEASE_DB')
+        self.leases = LeaseStore(lease_db, ttl=float(os.environ.get('LEASE_TTL', 120))) if lease_db else None
+        self.server = None
+        # 'incremental' only pages through resolved tasks newer than the watermark,
+        # with a full scan every RECONCILE_INTERVAL seconds; 'full' always scans everything
+        self.sync_mode = os.environ.get('SYNC_MODE', 'incremental').lower()
+        self.reconcile_interval = int(os.environ.get('RECONCILE_INTERVAL', 3600))
+        self.last_full_scan = {}
+        # Full scans of workspaces with at least SHARD_THRESHOLD known tasks run as
+        # SCAN_SHARDS parallel per-status scans
+        self.shard_threshold = int(os.environ.get('SHARD_THRESHOLD', 5000))
+        self.scan_shards = int(os.environ.get('SCAN_SHARDS', 4))
+        # METRICS=true serves Prometheus metrics on GET /metrics
+        self.metrics_enabled = os.environ.get('METRICS', 'false').lower() == 'true'
+        self.metrics = get_registry()
+        self.poll_seconds = self.metrics.histogram(
+            'poll_duration_seconds', 'Time to poll one workspace by scan mode')
+        self.poll_pages = self.metrics.histogram(
+            'poll_pages', 'Task pages fetched per workspace poll', PAGE_BUCKETS)
+        self.tasks_scanned = self.metrics.counter(
+            'poll_tasks_scanned_total', 'Tasks returned by Motion and diffed against the snapshot')
+        self.tasks_matched = self.metrics.counter(
+            'poll_tasks_matched_total', 'Scanned tasks that turned out to be new completions')
+        self.poll_errors = self.metrics.counter('poll_errors_total', 'Workspace polls that failed')
+        self.format_seconds = self.metrics.histogram(
+            'message_format_seconds', 'Time to format a Slack message or digest')
+        self.notification_lag = self.metrics.histogram(
+            'notification_lag_seconds', 'Time from task completion to the Slack post', LAG_BUCKETS)
+        self.notifications = self.metrics.counter(
+            'notifications_total', 'Queued notifications by delivery result')
+        self.metrics.add_collector('integration', self.collect_gauges)
+        # The poll and delivery loops beat here; /healthz fails, and with WATCHDOG the
+        # process exits for a restart, once one goes STALL_TIMEOUT past its schedule
+        self.heartbeats = Heartbeats(float(os.environ.get('STALL_TIMEOUT', 600)))
+        self.watchdog = os.environ.get('WATCHDOG', 'true').lower() == 'true'
+        # /readyz fails once a workspace hasn't been polled successfully for READY_MAX_POLL_AGE
+        # seconds (default: three of its slowest intervals) or, when READY_MAX_BACKLOG_AGE
+        # is set, once a notification has waited that long
+        ready_max_poll_age = os.environ.get('READY_MAX_POLL_AGE')
+        self.ready_max_poll_age = float(ready_max_poll_age) if ready_max_poll_age else None
+        ready_max_backlog_age = os.environ.get('READY_MAX_BACKLOG_AGE')
+        self.ready_max_backlog_age = float(ready_max_backlog_age) if ready_max_backlog_age else None
         
-    def load_state(self):
-        """Load the last checked timestamp from file"""
-        if self.state_file.exists():
-            try:
-                with open(self.state_file, 'r') as f:
-                    state = json.load(f)
-                    return datetime.fromisoformat(state.get('last_checked'))
-            except Exception as e:
-                logger.error(f"Error loading state: {e}")
+    def own_workspaces(self, workspace_ids):
+        """Restrict polling to a subset of the routed workspaces"""
+        self.workspaces = {workspace_id: self.workspaces[workspace_id] for workspace_id in workspace_ids}
+        self.routes = [route for route in self.routes if route.workspace_id in self.workspaces]
+        self.scheduler = PollScheduler.from_env(self.workspaces, self.poll_interval, adaptive=self.adaptive_polling)
+    
+    def claim(self, name):
+        """Take or renew a lease; always granted when leases are disabled"""
+        if self.leases is None:
+            return True
+        try:
+            return self.leases.acquire(name)
+        except Exception as e:
+            logger.error(f"Error acquiring lease {name}: {e}")
+            return False
+    
+    def load_state(self, workspace_id):
+        """Load a workspace's completion watermark"""
+        try:
+            watermark = self.state.get_watermark(workspace_id)
+            if watermark:
+                return watermark
+        except Exception as e:
+            logger.error(f"Error loading state: {e}")
         
         # Default to 1 hour ago if no state exists
-        return datetime.now(timezone.utc).replace(hour=datetime.now().hour - 1)
+        return datetime.now(timezone.utc) - timedelta(hours=1)
     
-    def save_state(self, timestamp):
-        """Save the last checked timestamp to file"""
+    def save_state(self, workspace_id, timestamp):
+        """Save a workspace's completion watermark"""
         try:
-            with open(self.state_file, 'w') as f:
-                json.dump({
-                    'last_checked': timestamp.isoformat(),
-                    'updated_at': datetime.now(timezone.utc).isoformat()
-                }, f)
+            self.state.set_watermark(workspace_id, timestamp)
         except Exception as e:
             logger.error(f"Error saving state: {e}")
     
@@ -79,123 +190,556 @@ class MotionSlackIntegration:
             return "Reminder only"
         return str(duration)
     
-    def format_slack_message(self, task):
-        """Format task data into a Slack message"""
-        # Extract task details
-        name = task.get('name', 'Unnamed task')
-        description = task.get('description', '').strip()
-        project_name = task.get('project', {}).get('name', 'No project')
-        duration = self.format_duration(task.get('duration', 'NONE'))
-        status = task.get('status', {}).get('name', 'Completed')
-        completed_time = task.get('completedTime', '')
-        priority = task.get('priority', 'MEDIUM')
+    def task_fields(self, task):
+        """Extract the display fields shared by text and Block Kit messages"""
+        completed_time = task.get('completedTime') or ''
+        completed_epoch = parse_timestamp(completed_time)
+        if completed_epoch is not None:
+            completed_at = from_epoch_ms(completed_epoch).strftime('%I:%M %p')
+        else:
+            completed_at = completed_time
         
-        # Enhanced HTML cleaning for description
-        if description:
-            # Remove common HTML tags and replace with appropriate formatting
-            description = description.replace('<p>', '').replace('</p>', '\n')
-            description = description.replace('<br>', '\n').replace('<br/>', '\n')
-            description = description.replace('<div>', '').replace('</div>', '\n')
-            description = description.replace('<strong>', '*').replace('</strong>', '*')
-            description = description.replace('<b>', '*').replace('</b>', '*')
-            description = description.replace('<em>', '_').replace('</em>', '_')
-            description = description.replace('<i>', '_').replace('</i>', '_')
-            description = description.replace('<ul>', '\n').replace('</ul>', '')
-            description = description.replace('<li>', '• ').replace('</li>', '\n')
-            description = description.replace('&nbsp;', ' ')
-            description = description.replace('&amp;', '&')
-            description = description.replace('&lt;', '<')
-            description = description.replace('&gt;', '>')
-            
-            # Clean up extra whitespace and newlines
-            description = '\n'.join(line.strip() for line in description.split('\n') if line.strip())
-            
-            # Truncate if too long but preserve formatting
-            if len(description) > 300:
-                description = description[:297] + "..."
+        return {
+            'name': escape(task.get('name') or 'Unnamed task'),
+            # Convert the HTML description to mrkdwn, truncated without breaking formatting
+            'description': html_to_mrkdwn((task.get('description') or '').strip(), limit=300),
+            'project': escape((task.get('project') or {}).get('name', 'No project')),
+            'duration': self.format_duration(task.get('duration', 'NONE')),
+            'status': (task.get('status') or {}).get('name', 'Completed'),
+            'priority': task.get('priority', 'MEDIUM'),
+            'completed_at': completed_at,
+        }
+    
+    def format_slack_message(self, task, fields=None):
+        """Format task data into a Slack message"""
+        fields = fields or self.task_fields(task)
         
         # Build the message with enhanced formatting
-        message = f"✅ *Task Completed: {name}*\n"
+        message = f"✅ *Task Completed: {fields['name']}*\n"
         
         # Add description if available (this is the main enhancement)
-        if description:
-            message += f"📝 *Description:*\n_{description}_\n\n"
+        if fields['description']:
+            message += f"📝 *Description:*\n{fields['description']}\n\n"
         
-        message += f"📁 *Project:* {project_name}\n"
-        message += f"⏱️ *Expected Duration:* {duration}\n"
-        message += f"🎯 *Priority:* {priority}\n"
-        message += f"📊 *Status:* {status}\n"
+        message += f"📁 *Project:* {fields['project']}\n"
+        message += f"⏱️ *Expected Duration:* {fields['duration']}\n"
+        message += f"🎯 *Priority:* {fields['priority']}\n"
+        message += f"📊 *Status:* {fields['status']}\n"
         
-        if completed_time:
-            try:
-                completed_dt = datetime.fromisoformat(completed_time.replace('Z', '+00:00'))
-                formatted_time = completed_dt.strftime('%I:%M %p')
-                message += f"✓ *Completed at:* {formatted_time}"
-            except:
-                message += f"✓ *Completed at:* {completed_time}"
+        if fields['completed_at']:
+            message += f"✓ *Completed at:* {fields['completed_at']}"
         
         return message
     
-    def check_for_completed_tasks(self):
-        """Check Motion for newly completed tasks"""
-        last_checked = self.load_state()
-        current_time = datetime.now(timezone.utc)
+    def needs_full_scan(self, workspace_id):
+        """Whether the next poll should scan the whole workspace"""
+        last_full_scan = self.last_full_scan.get(workspace_id)
+        if self.sync_mode == 'full' or last_full_scan is None:
+            return True
+        return time.monotonic() - last_full_scan >= self.reconcile_interval
+    
+    async def fetch_task_pages(self, workspace_id, last_checked):
+        """Stream the pages of tasks to inspect, incrementally when possible"""
+        if not self.needs_full_scan(workspace_id):
+            statuses = await self.motion.get_resolved_statuses_async(workspace_id)
+            if statuses:
+                logger.info(f"Incremental sync of {workspace_id} for statuses: {', '.join(statuses)}")
+                async for page in self.motion.aiter_task_pages(
+                    workspace_id=workspace_id,
+                    statuses=statuses,
+                    completed_since=last_checked,
+                    fields=TASK_FIELDS
+                ):
+                    yield page
+                return
+            logger.warning("No resolved statuses found, falling back to a full scan")
         
-        logger.info(f"Checking for tasks completed since {last_checked}")
+        statuses = []
+        if self.scan_shards > 1 and self.store.count(workspace_id) >= self.shard_threshold:
+            statuses = [
+                status['name'] for status in await asyncio.to_thread(self.motion.get_statuses, workspace_id)
+                if status.get('name')
+            ]
+        if len(statuses) > 1:
+            logger.info(f"Running full scan of workspace {workspace_id} as {len(statuses)} status shards")
+            pages = self.motion.aiter_task_pages_by_status(
+                workspace_id, statuses, fields=TASK_FIELDS, concurrency=self.scan_shards
+            )
+        else:
+            logger.info(f"Running full scan of workspace {workspace_id}")
+            pages = self.motion.aiter_task_pages(
+                workspace_id=workspace_id,
+                include_all_statuses=True,
+                fields=TASK_FIELDS
+            )
+        async for page in pages:
+            yield page
+        self.last_full_scan[workspace_id] = time.monotonic()
+    
+    def check_for_completed_tasks(self, workspace_ids=None):
+        """Check the given workspaces (default: all) for newly completed tasks"""
+        asyncio.run(self.check_for_completed_tasks_async(workspace_ids))
+    
+    async def check_for_completed_tasks_async(self, workspace_ids=None):
+        """Poll workspaces concurrently, then wake the delivery worker"""
+        # Workspaces leased to another process are left to it
+        claimed = []
+        for workspace_id in (workspace_ids or self.workspaces):
+            if self.claim(f"workspace:{workspace_id}"):
+                claimed.append(workspace_id)
+            else:
+                self.defer_unowned(workspace_id)
+        if not claimed:
+            return
+        await asyncio.gather(*(self.check_workspace(workspace_id) for workspace_id in claimed))
+        self.delivery_wakeup.set()
+        self.log_rate_limits()
+        self.log_metrics()
+
+    def defer_unowned(self, workspace_id):
+        """Wait until the lease could next change hands before trying a workspace again"""
+        self.scheduler.defer(workspace_id, self.leases.ttl / 3)
+    
+    def collect_gauges(self):
+        """Refresh the queue depth and rate limiter gauges before metrics are read"""
+        self.metrics.gauge('delivery_queue_depth', 'Notifications waiting to reach Slack').set(self.queue.depth())
+        tokens = self.metrics.gauge('rate_limiter_tokens', 'Tokens left in each rate-limit bucket')
+        waited = self.metrics.gauge(
+            'rate_limiter_wait_seconds', 'Total time spent waiting on each rate-limit bucket')
+        for key, stats in self.rate_limiter.metrics().items():
+            tokens.set(stats['tokens'], key=key)
+            waited.set(stats['wait_seconds_total'], key=key)
+        circuit = self.metrics.gauge('circuit_state', 'Circuit breaker state per upstream (0 closed, 1 half-open, 2 open)')
+        for upstream, stats in breaker_states().items():
+            circuit.set({'closed': 0, 'half_open': 1, 'open': 2}[stats['state']], upstream=upstream)
+    
+    def log_metrics(self):
+        """Log a one-line JSON summary of the metrics for log-based dashboards"""
+        logger.info(f"Metrics summary: {json.dumps(self.metrics.summary(), sort_keys=True)}")
+    
+    def log_rate_limits(self):
+        """Log the fill level and accumulated wait of each rate-limit bucket"""
+        for key, stats in self.rate_limiter.metrics().items():
+            logger.info(
+                f"Rate limit {key}: {stats['tokens']}/{stats['capacity']} tokens, "
+                f"waited {stats['wait_seconds_total']}s over {stats['waits']} waits"
+            )
+    
+    async def check_workspace(self, workspace_id):
+        """Check one Motion workspace for newly completed tasks"""
+        routes = self.workspaces[workspace_id]
+        last_checked = self.load_state(workspace_id)
+        
+        logger.info(f"Checking workspace {workspace_id} for tasks completed since {last_checked}")
+        rate_limit_hits = self.motion.rate_limit_hits
+        mode = 'full' if self.needs_full_scan(workspace_id) else 'incremental'
+        started = time.perf_counter()
+        pages = scanned = 0
         
         try:
-            # Get all tasks from the workspace
-            tasks = self.motion.get_tasks(
-                workspace_id=self.workspace_id,
-                include_all_statuses=True
+            # Diff each page against the local snapshot as it arrives; completions
+            # are queued before the page is committed. Bootstrapping lasts until a
+            # full scan completes, so pages kept from an interrupted one don't turn
+            # old completions into new ones
+            bootstrapping = not self.store.is_bootstrapped(workspace_id)
+            full_scan_before = self.last_full_scan.get(workspace_id)
+            transitions = []
+            async for page in self.fetch_task_pages(workspace_id, last_checked):
+                if not self.claim(f"workspace:{workspace_id}"):
+                    # Renewed per page; the watermark is left for the new owner
+                    logger.warning(f"Lost the lease on workspace {workspace_id}, stopping its poll")
+                    self.defer_unowned(workspace_id)
+                    return
+                self.heartbeats.beat('poll')
+                pages += 1
+                scanned += len(page)
+                transitions.extend(await asyncio.to_thread(
+                    self.store.diff,
+                    workspace_id, page,
+                    bootstrap_since=last_checked,
+                    bootstrapping=bootstrapping,
+                    on_transitions=lambda found: self.enqueue_completions(routes, found)
+                ))
+            if bootstrapping and self.last_full_scan.get(workspace_id) != full_scan_before:
+                self.store.mark_bootstrapped(workspace_id)
+                logger.info(f"Bootstrapped task snapshot for workspace {workspace_id}")
+            new_completions = sum(1 for kind, _ in transitions if kind in (COMPLETED, RECOMPLETED))
+            reopened = sum(1 for kind, _ in transitions if kind == REOPENED)
+            if reopened:
+                logger.info(f"Detected {reopened} reopened tasks")
+            
+            logger.info(f"Found {new_completions} newly completed tasks")
+            self.tasks_scanned.inc(scanned, workspace=workspace_id)
+            self.tasks_matched.inc(new_completions, workspace=workspace_id)
+            self.poll_pages.observe(pages, mode=mode)
+            self.poll_seconds.observe(time.perf_counter() - started, mode=mode)
+            self.scheduler.record(
+                workspace_id,
+                completions=new_completions,
+                rate_limited=self.motion.rate_limit_hits > rate_limit_hits
             )
             
-            # Filter for newly completed tasks
-            new_completions = []
-            for task in tasks:
-                if task.get('completed'):
-                    completed_time_str = task.get('completedTime')
-                    if completed_time_str:
-                        completed_time = datetime.fromisoformat(
-                            completed_time_str.replace('Z', '+00:00')
-                        )
-                        if completed_time > last_checked:
-                            new_completions.append(task)
+            # Advance the watermark to the newest completion Motion reported; saved even
+            # when unchanged, as its update time marks the last successful poll
+            latest = self.store.latest_completed_epoch(workspace_id)
+            self.save_state(workspace_id, max(from_epoch_ms(latest), last_checked) if latest else last_checked)
             
-            logger.info(f"Found {len(new_completions)} newly completed tasks")
+        except CircuitOpenError as e:
+            # Pages already diffed stay recorded, but the watermark is left alone
+            logger.warning(f"Skipping the rest of workspace {workspace_id}: {e}")
+            self.poll_errors.inc(workspace=workspace_id)
+            self.scheduler.record(workspace_id, error=True)
+        except Exception as e:
+            logger.error(f"Error checking workspace {workspace_id} for completed tasks: {e}")
+            self.poll_errors.inc(workspace=workspace_id)
+            self.scheduler.record(workspace_id, error=True)
+    
+    def enqueue_completions(self, routes, transitions):
+        """Queue each completed task for every channel routed to it"""
+        queued = 0
+        for kind, task in transitions:
+            if kind not in (COMPLETED, RECOMPLETED):
+                continue
+            for channel in channels_for(task, routes):
+                if self.state.is_delivered(self.queue.dedupe_key(channel, task)):
+                    # Already posted, even if the outbox row has since been purged
+                    continue
+                if self.queue.enqueue(channel, task):
+                    queued += 1
+        if queued:
+            logger.info(f"Queued {queued} Slack notifications")
+    
+    def handle_webhook_task(self, task):
+        """Feed a task pushed by a webhook into the polling detection path"""
+        workspace_id = (task.get('workspace') or {}).get('id') or task.get('workspaceId')
+        routes = self.workspaces.get(workspace_id)
+        if not routes:
+            logger.info(f"Ignoring webhook for unrouted workspace {workspace_id}")
+            return False
+        
+        transitions = self.store.diff(
+            workspace_id, [task],
+            bootstrap_since=self.load_state(workspace_id),
+            on_transitions=lambda found: self.enqueue_completions(routes, found)
+        )
+        if transitions:
+            logger.info(f"Webhook for task {task.get('id')}: {', '.join(kind for kind, _ in transitions)}")
+            self.delivery_wakeup.set()
+        return True
+    
+    def health_status(self):
+        """Loop heartbeats, poll recency, watermark lag, circuit states and delivery backlog"""
+        now = datetime.now(timezone.utc)
+        workspaces = {}
+        for workspace_id in self.workspaces:
+            polled = self.state.watermark_updated_at(workspace_id)
+            watermark = self.state.get_watermark(workspace_id)
+            workspaces[workspace_id] = {
+                'last_poll_seconds_ago': round((now - polled).total_seconds(), 1) if polled else None,
+                'watermark_lag_seconds': round((now - watermark).total_seconds(), 1) if watermark else None,
+            }
+        oldest = self.queue.oldest_pending()
+        return {
+            'loops': self.heartbeats.snapshot(),
+            'workspaces': workspaces,
+            'circuits': breaker_states(),
+            'backlog': {
+                'depth': self.queue.depth(),
+                'oldest_seconds': round(time.time() - oldest, 1) if oldest else None,
+                'parked': self.queue.parked(),
+            },
+        }
+    
+    def readiness_problems(self, status):
+        """Reasons the service should not be considered ready"""
+        problems = [f"{loop} loop stalled" for loop, info in status['loops'].items() if info['stalled']]
+        max_poll_age = self.ready_max_poll_age
+        if max_poll_age is None:
+            max_poll_age = 3 * max(
+                (schedule.max_interval for schedule in self.scheduler.schedules.values()),
+                default=self.poll_interval
+            )
+        for workspace_id, info in status['workspaces'].items():
+            age = info['last_poll_seconds_ago']
+            if age is None:
+                problems.append(f"workspace {workspace_id} not polled successfully yet")
+            elif age > max_poll_age:
+                problems.append(f"workspace {workspace_id} not polled successfully for {age:.0f}s")
+        problems.extend(
+            f"{upstream} circuit open" for upstream, stats in status['circuits'].items()
+            if stats['state'] == 'open'
+        )
+        oldest = status['backlog']['oldest_seconds']
+        if self.ready_max_backlog_age is not None and oldest is not None and oldest > self.ready_max_backlog_age:
+            problems.append(f"oldest pending notification waited {oldest:.0f}s")
+        return problems
+    
+    def handle_healthz(self, body, headers):
+        """EmbeddedServer handler for GET /healthz: fails only when a loop has stalled"""
+        stalled = self.heartbeats.overdue()
+        return json_response(503 if stalled else 200, {
+            'status': 'stalled' if stalled else 'ok',
+            'loops': self.heartbeats.snapshot(),
+        })
+    
+    def handle_readyz(self, body, headers):
+        """EmbeddedServer handler for GET /readyz: polls, upstreams and backlog are healthy"""
+        status = self.health_status()
+        problems = self.readiness_problems(status)
+        status['status'] = 'not ready' if problems else 'ready'
+        status['problems'] = problems
+        return json_response(503 if problems else 200, status)
+    
+    def start_http_server(self):
+        """Serve the health, webhook and metrics endpoints on a background thread"""
+        self.server = EmbeddedServer(port=self.http_port)
+        self.server.route('GET', '/healthz', self.handle_healthz)
+        self.server.route('GET', '/readyz', self.handle_readyz)
+        if self.webhook_secret:
+            receiver = WebhookReceiver(
+                self.webhook_secret,
+                self.handle_webhook_task,
+                os.environ.get('WEBHOOK_SIGNATURE_HEADER', 'X-Motion-Signature')
+            )
+            self.server.route('POST', '/webhooks/motion', receiver.handle)
+        if self.metrics_enabled:
+            self.server.route('GET', '/metrics', self.metrics.handle)
+        self.server.start()
+    
+    def total_duration(self, tasks):
+        """Sum of the expected durations, in minutes, of tasks that have one"""
+        return sum(
+            task['duration'] for task in tasks
+            if isinstance(task.get('duration'), (int, float)) and not isinstance(task['duration'], bool)
+        )
+    
+    def format_digest(self, tasks):
+        """Format a burst of completions into a single Slack message, grouped by project"""
+        by_project = {}
+        for task in tasks:
+            by_project.setdefault((task.get('project') or {}).get('name') or 'No project', []).append(task)
+        
+        total = self.total_duration(tasks)
+        message = f"✅ *{len(tasks)} Tasks Completed*"
+        message += f" ({self.format_duration(total)} total)\n" if total else "\n"
+        listed = 0
+        # Busiest projects first
+        for project, project_tasks in sorted(by_project.items(), key=lambda entry: (-len(entry[1]), entry[0])):
+            project_total = self.total_duration(project_tasks)
+            message += f"\n📁 *{escape(project)}*: {len(project_tasks)} task{'s' if len(project_tasks) != 1 else ''}"
+            message += f", {self.format_duration(project_total)}\n" if project_total else "\n"
+            for task in project_tasks[:max(DIGEST_LINES - listed, 0)]:
+                duration = task.get('duration')
+                suffix = f" ({self.format_duration(duration)})" if isinstance(duration, (int, float)) else ""
+                message += f"• {escape(task.get('name') or 'Unnamed task')}{suffix}\n"
+                listed += 1
+        if len(tasks) > listed:
+            message += f"…and {len(tasks) - listed} more"
+        return message
+    
+    def render_message(self, task, channel):
+        """Build a task's text and, in blocks mode, its Block Kit payload
+
+        Formatting errors degrade to the task name rather than never delivering it.
+        """
+        try:
+            fields = self.task_fields(task)
+            text = self.format_slack_message(task, fields)
+            if self.message_format != 'blocks':
+                return text, None
+            template_text, blocks = self.templates.select(channel, task).render(fields)
+            return template_text or text, blocks
+        except Exception as e:
+            logger.error(f"Error formatting task {task.get('id')}: {e}")
+            return f"✅ *Task Completed: {escape(task.get('name') or 'Unnamed task')}*", None
+    
+    async def deliver_channel(self, channel, items, semaphore):
+        """Deliver one channel's pending items, as a digest when there are many"""
+        digest = len(items) > self.digest_threshold or (self.digest_window > 0 and len(items) > 1)
+        async with semaphore:
+            with self.format_seconds.time(kind='digest' if digest else 'task'):
+                if digest:
+                    batches = [(items, (self.format_digest([item.task for item in items]), None))]
+                else:
+                    batches = [([item], self.render_message(item.task, channel)) for item in items]
             
-            # Post each completed task to Slack
-            for task in new_completions:
+            for batch, (message, blocks) in batches:
+                self.heartbeats.beat('delivery')
+                if not self.claim('delivery'):
+                    logger.warning(f"Lost the delivery lease, leaving {channel} to its new owner")
+                    return
+                ids = [item.id for item in batch]
                 try:
-                    message = self.format_slack_message(task)
-                    self.slack.post_message(self.channel, message)
-                    logger.info(f"Posted to Slack: {task.get('name')}")
+                    response = await self.post_with_fallback(channel, message, blocks)
+                    self.queue.mark_delivered(ids)
+                    self.record_delivered(batch)
+                    logger.info(f"Posted {len(batch)} completion(s) to Slack ({channel})")
                 except Exception as e:
-                    logger.error(f"Error posting task to Slack: {e}")
-            
-            # Update state
-            self.save_state(current_time)
-            
+                    permanent = isinstance(e, SlackAPIError) and e.permanent
+                    parked = self.queue.mark_failed(ids, str(e), permanent=permanent)
+                    if parked:
+                        self.notifications.inc(len(parked), result='parked')
+                        logger.error(
+                            f"Giving up on {len(parked)} notification(s) for {channel}: {e} "
+                            f"(kept in {self.queue.path} with the error)"
+                        )
+                    else:
+                        self.notifications.inc(len(ids), result='failed')
+                        logger.error(f"Error posting to Slack ({channel}), will retry: {e}")
+                    continue
+                if digest and self.digest_threads:
+                    await self.post_thread_details(channel, batch, (response or {}).get('ts'))
+    
+    async def post_with_fallback(self, channel, message, blocks, thread_ts=None):
+        """Post a message, falling back to its plain text when Slack rejects the blocks"""
+        try:
+            return await self.slack.post_message_async(channel, message, blocks, thread_ts=thread_ts)
+        except SlackAPIError as e:
+            if not blocks or e.error not in ('invalid_blocks', 'invalid_blocks_format'):
+                raise
+            logger.warning(f"Slack rejected the Block Kit message for {channel} ({e.error}), posting text only")
+            return await self.slack.post_message_async(channel, message, thread_ts=thread_ts)
+    
+    async def post_thread_details(self, channel, items, thread_ts):
+        """Reply to a posted digest with each task's full message
+        
+        The digest already counts as the delivery, so failed replies are
+        logged rather than retried.
+        """
+        if not thread_ts:
+            return
+        for item in items:
+            self.heartbeats.beat('delivery')
+            message, blocks = self.render_message(item.task, channel)
+            try:
+                await self.post_with_fallback(channel, message, blocks, thread_ts=thread_ts)
+            except Exception as e:
+                logger.warning(f"Error replying with task {item.task_id} in {channel} digest thread: {e}")
+    
+    def record_delivered(self, items):
+        """Persist delivery records, count them and observe the completion-to-notification lag"""
+        try:
+            self.state.record_deliveries(
+                (self.queue.dedupe_key(item.channel, item.task), item.channel, item.task_id)
+                for item in items
+            )
         except Exception as e:
-            logger.error(f"Error checking for completed tasks: {e}")
+            logger.error(f"Error recording deliveries: {e}")
+        self.notifications.inc(len(items), result='delivered')
+        now_ms = time.time() * 1000
+        for item in items:
+            completed = parse_timestamp(item.task.get('completedTime'))
+            if completed is not None:
+                self.notification_lag.observe(max(now_ms - completed, 0) / 1000)
+    
+    async def deliver_pending(self):
+        """Deliver everything in the outbox that is due"""
+        if not self.slack.breaker.available():
+            # Leave items untouched instead of burning their retry attempts
+            logger.info(f"Slack circuit open, holding {self.queue.depth()} queued notifications")
+            return
+        if not self.claim('delivery'):
+            # Another process is delivering the shared outbox
+            return
+        by_channel = {}
+        for item in self.queue.due():
+            by_channel.setdefault(item.channel, []).append(item)
+        if self.digest_window > 0:
+            # Hold each channel until its oldest pending completion has waited out the window
+            window_start = time.time() - self.digest_window
+            by_channel = {
+                channel: items for channel, items in by_channel.items()
+                if items[0].created_at <= window_start
+            }
+        if not by_channel:
+            return
+        
+        # Channels are delivered concurrently; posts within a channel stay ordered
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        await asyncio.gather(*(
+            self.deliver_channel(channel, items, semaphore)
+            for channel, items in by_channel.items()
+        ))
+        logger.info(f"Delivery queue depth: {self.queue.depth()}")
+    
+    def delivery_loop(self):
+        """Deliver queued notifications whenever a poll finishes or retries fall due"""
+        while True:
+            self.heartbeats.beat('delivery', self.delivery_interval)
+            self.delivery_wakeup.wait(self.delivery_interval)
+            self.delivery_wakeup.clear()
+            try:
+                asyncio.run(self.deliver_pending())
+                self.queue.purge_delivered()
+            except Exception as e:
+                logger.error(f"Unexpected error in delivery worker: {e}")
+    
+    def start_delivery_worker(self):
+        """Run the delivery loop on a background thread"""
+        if self.delivery_thread is None:
+            self.delivery_thread = threading.Thread(
+                target=self.delivery_loop, name='delivery', daemon=True
+            )
+            self.delivery_thread.start()
     
     def run(self):
         """Main polling loop"""
-        logger.info(f"Starting Motion-Slack integration (polling every {self.poll_interval}s)")
-        logger.info(f"Workspace: {self.workspace_id}")
-        logger.info(f"Slack channel: {self.channel}")
-        
+        schedule = next(iter(self.scheduler.schedules.values()))
+        logger.info(
+            f"Starting Motion-Slack integration (polling every {self.poll_interval}s, "
+            f"adapting between {schedule.min_interval:.0f}s and {schedule.max_interval:.0f}s)"
+        )
+        for route in self.routes:
+            filters = ', '.join(route.projects + route.labels) or 'all tasks'
+            logger.info(f"Workspace {route.workspace_id} ({filters}) -> {', '.join(route.channels)}")
+        logger.info(f"Sync mode: {self.sync_mode} (full reconciliation every {self.reconcile_interval}s)")
+        logger.info(f"Pending Slack notifications: {self.queue.depth()}")
+        self.start_delivery_worker()
+        if self.webhook_secret:
+            logger.info("Webhook mode: receiving Motion task webhooks, polling for reconciliation only")
+        self.start_http_server()
+        if self.watchdog:
+            self.heartbeats.watch()
+        self.poll_loop()
+    
+    def poll_loop(self):
+        """Poll each workspace whenever its schedule is due"""
         while True:
             try:
-                self.check_for_completed_tasks()
+                wait = None
+                if self.leases:
+                    # Keep idle workspaces leased between polls
+                    for workspace_id in self.workspaces:
+                        self.claim(f"workspace:{workspace_id}")
+                    wait = self.leases.ttl / 3
+                due = self.scheduler.due()
+                if due:
+                    self.heartbeats.beat('poll')
+                    self.check_for_completed_tasks(due)
+                next_due = self.scheduler.seconds_until_next()
+                wait = next_due if wait is None else min(next_due, wait)
+                self.heartbeats.beat('poll', wait)
+                time.sleep(wait)
             except KeyboardInterrupt:
                 logger.info("Shutting down...")
                 break
             except Exception as e:
                 logger.error(f"Unexpected error in main loop: {e}")
-            
-            time.sleep(self.poll_interval)
+                self.heartbeats.beat('poll', self.poll_interval)
+                time.sleep(self.poll_interval)
+
+def main():
+    """Run the service: one process, or a supervisor with WORKERS worker processes"""
+    load_dotenv()
+    configure_logging()
+    validate_environment()
+    workers = int(os.environ.get('WORKERS', 1))
+    if workers > 1:
+        from supervisor import Supervisor
+        Supervisor(workers).run()
+    else:
+        integration = MotionSlackIntegration()
+        integration.run()
 
 if __name__ == "__main__":
-    integration = MotionSlackIntegration()
-    integration.run()
\ No newline at end of file
+    main()
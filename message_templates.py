@@ -0,0 +1,147 @@
+import json
+import logging
+from string import Formatter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Built-in Block Kit layout; mirrors the plain text message
+DEFAULT_TEMPLATE = {
+    "blocks": [
+        {"type": "section", "text": {"type": "mrkdwn", "text": "✅ *Task Completed: {name}*"}},
+        {
+            "if": "description",
+            "type": "section",
+            "text": {"type": "mrkdwn", "text": "📝 *Description:*\n{description}"}
+        },
+        {
+            "type": "section",
+            "fields": [
+                {"type": "mrkdwn", "text": "📁 *Project:*\n{project}"},
+                {"type": "mrkdwn", "text": "⏱️ *Expected Duration:*\n{duration}"},
+                {"type": "mrkdwn", "text": "🎯 *Priority:*\n{priority}"},
+                {"type": "mrkdwn", "text": "📊 *Status:*\n{status}"}
+            ]
+        },
+        {
+            "if": "completed_at",
+            "type": "context",
+            "elements": [{"type": "mrkdwn", "text": "✓ Completed at {completed_at}"}]
+        }
+    ]
+}
+
+_formatter = Formatter()
+
+
+def _compile(node: Any) -> Tuple[bool, Callable[[Dict], Any]]:
+    """Compile a template node into a render function
+
+    Returns ``(dynamic, render)``. Subtrees without placeholders are static
+    and render to the very same object every time, so only the parts that
+    reference task fields are rebuilt per message.
+    """
+    if isinstance(node, str):
+        parts = [(literal, field) for literal, field, _, _ in _formatter.parse(node)]
+        if all(field is None for _, field in parts):
+            literal = node.replace("{{", "{").replace("}}", "}")
+            return False, lambda fields: literal
+        return True, lambda fields: "".join(
+            literal + (str(fields.get(field, "")) if field is not None else "")
+            for literal, field in parts
+        )
+
+    if isinstance(node, list):
+        compiled = []
+        for item in node:
+            condition = item.get("if") if isinstance(item, dict) else None
+            if condition is not None:
+                item = {key: value for key, value in item.items() if key != "if"}
+            compiled.append((condition, *_compile(item)))
+        if not any(dynamic or condition for condition, dynamic, _ in compiled):
+            return False, lambda fields: node
+        return True, lambda fields: [
+            render(fields) for condition, _, render in compiled
+            if condition is None or fields.get(condition)
+        ]
+
+    if isinstance(node, dict):
+        compiled = {key: _compile(value) for key, value in node.items()}
+        if not any(dynamic for dynamic, _ in compiled.values()):
+            return False, lambda fields: node
+        static = {key: render({}) for key, (dynamic, render) in compiled.items() if not dynamic}
+        dynamic_parts = [(key, render) for key, (dynamic, render) in compiled.items() if dynamic]
+
+        def render_dict(fields):
+            rendered = dict(static)
+            for key, render in dynamic_parts:
+                rendered[key] = render(fields)
+            return rendered
+        return True, render_dict
+
+    return False, lambda fields: node
+
+
+class MessageTemplate:
+    """A Block Kit template compiled once and rendered per task"""
+
+    def __init__(self, name: str, spec: Dict):
+        self.name = name
+        self.text = spec.get("text")
+        _, self._render_blocks = _compile(spec.get("blocks", []))
+        _, self._render_text = _compile(self.text) if self.text else (False, None)
+
+    def render(self, fields: Dict[str, str]) -> Tuple[Optional[str], List[Dict]]:
+        """Render the text fallback (if the template defines one) and blocks"""
+        text = self._render_text(fields) if self._render_text else None
+        return text, self._render_blocks(fields)
+
+
+class TemplateRegistry:
+    """Compiled templates and the rules choosing one per channel and project
+
+    The optional JSON file looks like::
+
+        {"templates": {"compact": {"text": "✅ {name}", "blocks": [...]}},
+         "channels": {"#releases": "compact"},
+         "projects": {"Website Redesign": "compact"}}
+
+    String values may reference task fields as ``{name}``, ``{description}``,
+    ``{project}``, ``{duration}``, ``{priority}``, ``{status}`` and
+    ``{completed_at}``. A block with ``"if": "<field>"`` is omitted when that
+    field is empty. Project rules win over channel rules; anything unmatched
+    uses the ``default`` template.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        config = config or {}
+        specs = {"default": DEFAULT_TEMPLATE}
+        specs.update(config.get("templates", {}))
+        self.templates = {name: MessageTemplate(name, spec) for name, spec in specs.items()}
+        self.channels = config.get("channels", {})
+        self.projects = config.get("projects", {})
+
+        for rule in list(self.channels.values()) + list(self.projects.values()):
+            if rule not in self.templates:
+                raise ValueError(f"Unknown message template: {rule}")
+
+    @classmethod
+    def from_file(cls, path: Optional[str]) -> 'TemplateRegistry':
+        """Load templates from a JSON file, or use only the built-in default"""
+        if not path:
+            return cls()
+        with open(path, 'r') as f:
+            registry = cls(json.load(f))
+        logger.info(f"Loaded {len(registry.templates)} message templates from {path}")
+        return registry
+
+    def select(self, channel: str, task: Dict) -> MessageTemplate:
+        """Choose the template for a task posted to a channel"""
+        project = task.get('project') or {}
+        name = (
+            self.projects.get(project.get('id'))
+            or self.projects.get(project.get('name'))
+            or self.channels.get(channel)
+            or "default"
+        )
+        return self.templates[name]
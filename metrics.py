@@ -0,0 +1,217 @@
+import bisect
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Default latency buckets in seconds, from a fast cache hit to a slow Motion page
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Path segments that look like ids are collapsed so label cardinality stays bounded
+_ID_SEGMENT = re.compile(r"^(?=.*\d)[A-Za-z0-9_-]{8,}$")
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def endpoint_label(endpoint: str) -> str:
+    """Normalise an API path for use as a label, e.g. /tasks/{id}"""
+    return "/".join("{id}" if _ID_SEGMENT.match(part) else part for part in endpoint.split("/"))
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (
+        f'{name}="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    """Base class holding one value per label set"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+    def total(self) -> float:
+        """Sum over all label sets"""
+        with self.lock:
+            return sum(self.values.values())
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[_label_key(labels)] = value
+
+
+class Histogram(Metric):
+    """Cumulative bucketed observations with a running sum and count"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the enclosed block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for key, series in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series["counts"]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', le))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+    def total(self) -> float:
+        with self.lock:
+            return sum(series["count"] for series in self.values.values())
+
+    def summary(self) -> Dict[str, float]:
+        """Count, mean and an approximate p95 over all label sets"""
+        with self.lock:
+            counts = [0] * (len(self.buckets) + 1)
+            total_sum = 0.0
+            for series in self.values.values():
+                counts = [a + b for a, b in zip(counts, series["counts"])]
+                total_sum += series["sum"]
+        count = sum(counts)
+        if not count:
+            return {"count": 0}
+        threshold, cumulative, p95 = 0.95 * count, 0, self.buckets[-1]
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            if cumulative >= threshold:
+                p95 = bound
+                break
+        return {"count": count, "mean": round(total_sum / count, 4), "p95_le": p95}
+
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors: Dict[str, Callable[[], None]] = {}
+        self.lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, help_text: str, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str,
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def add_collector(self, name: str, collector: Callable[[], None]):
+        """Register a callback that refreshes gauges right before they are read
+
+        Registering again under the same name replaces the earlier callback.
+        """
+        self.collectors[name] = collector
+
+    def collect(self):
+        for collector in list(self.collectors.values()):
+            collector()
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        self.collect()
+        with self.lock:
+            metrics = [self.metrics[name] for name in sorted(self.metrics)]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict[str, object]:
+        """Compact totals for structured log lines"""
+        self.collect()
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return {
+            metric.name: metric.summary() if isinstance(metric, Histogram) else round(metric.total(), 3)
+            for metric in metrics
+        }
+
+    def handle(self, body: bytes, headers: Dict[str, str]) -> Tuple[int, str, bytes]:
+        """EmbeddedServer handler for GET /metrics"""
+        return 200, "text/plain; version=0.0.4; charset=utf-8", self.render().encode("utf-8")
+
+
+_default_registry = Registry()
+
+
+def get_registry() -> Registry:
+    """Process-wide registry shared by the clients and the integration"""
+    return _default_registry
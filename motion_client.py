@@ -1,87 +1,386 @@
+import asyncio
+import os
+import hashlib
+import json
 import requests
 import logging
 import time
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
 from urllib.parse import urlencode
 
+from circuit_breaker import CircuitOpenError, get_breaker
+from fast_json import decode_task_page, loads
+from http_cache import CacheEntry, HTTPCache
+from metrics import endpoint_label, get_registry
+from rate_limiter import RateLimiter, get_default_limiter
+from timeutil import parse_timestamp, to_epoch_ms
+from transport import TransportConfig, build_session
+
 logger = logging.getLogger(__name__)
 
+_metrics = get_registry()
+REQUEST_SECONDS = _metrics.histogram("motion_request_duration_seconds", "Motion API request latency by endpoint")
+REQUESTS = _metrics.counter("motion_requests_total", "Motion API responses by endpoint and status")
+RETRIES = _metrics.counter("motion_retries_total", "Motion API requests retried by endpoint")
+RATE_LIMITED = _metrics.counter("motion_rate_limited_total", "Motion API 429 responses by endpoint")
+CACHE_LOOKUPS = _metrics.counter("motion_cache_lookups_total", "Motion response cache lookups by result")
+
 class MotionClient:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, rate_limiter: Optional[RateLimiter] = None,
+                 cache: Optional[HTTPCache] = None, transport: Optional[TransportConfig] = None):
         self.api_key = api_key
-        self.base_url = "https://api.usemotion.com/v1"
+        # Overridable so the benchmark can point the client at a local stand-in
+        self.base_url = os.environ.get("MOTION_API_URL", "https://api.usemotion.com/v1").rstrip("/")
         self.headers = {
             "X-API-Key": api_key,
             "Content-Type": "application/json"
         }
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        # Pooled keep-alive connections shared by every call, with split timeouts
+        self.transport = transport or TransportConfig.from_env()
+        self.session = build_session(self.transport, self.headers)
+        # Motion's quota applies to the API key as a whole, so all endpoints share one bucket
+        self.rate_limiter = rate_limiter or get_default_limiter()
+        # Number of 429 responses seen, so callers can back off their polling
+        self.rate_limit_hits = 0
+        # Fetches the next page of a listing while the caller processes the current one
+        self.prefetch_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="motion-prefetch")
+        # Tasks per /tasks page; only sent when set, otherwise Motion's default applies
+        page_size = os.environ.get("MOTION_PAGE_SIZE")
+        self.page_size = int(page_size) if page_size else None
+        # Opens after repeated connection errors/5xx so an outage fails fast
+        self.breaker = get_breaker("motion")
+        # Slow-changing entities (statuses, workspaces, users, projects) are served from here
+        self.cache = cache or HTTPCache.from_env()
+        # Keeps entries of different API keys apart in a shared on-disk cache
+        self.cache_namespace = hashlib.sha1(api_key.encode("utf-8")).hexdigest()[:12]
+    
+    def _cache_key(self, endpoint: str, params: Optional[Dict]) -> str:
+        encoded = json.dumps(params or {}, sort_keys=True, separators=(",", ":"))
+        return f"{self.cache_namespace}:{endpoint}?{encoded}"
+    
+    def _cache_get(self, key: str) -> Optional[CacheEntry]:
+        """Cached entry for a key; cache failures count as a miss"""
+        try:
+            return self.cache.get(key)
+        except Exception as e:
+            logger.warning(f"Error reading the response cache: {e}")
+            return None
+    
+    def _cache_set(self, key: str, entry: CacheEntry):
+        """Store a response; cache failures never fail the request that produced it"""
+        try:
+            self.cache.set(key, entry)
+        except Exception as e:
+            logger.warning(f"Error writing the response cache: {e}")
     
     def _make_request(self, method: str, endpoint: str, params: Optional[Dict] = None, 
-                     json_data: Optional[Dict] = None) -> Dict:
-        """Make a request to the Motion API with retry logic"""
+                     json_data: Optional[Dict] = None,
+                     decode: Optional[Callable[[bytes], Dict]] = None) -> Dict:
+        """Make a request to the Motion API with retry logic
+        
+        Bodies are decoded with ``decode`` when given, otherwise with the
+        fastest JSON decoder installed.
+        
+        GETs of cacheable endpoints are answered from the cache while fresh.
+        Once stale they are revalidated with If-None-Match/If-Modified-Since,
+        and a 304 reuses the cached body. While the circuit is open, calls
+        raise CircuitOpenError without touching the network (a stale cached
+        body is returned instead when there is one).
+        """
         url = f"{self.base_url}{endpoint}"
+        label = endpoint_label(endpoint)
+        ttl = self.cache.ttl_for(endpoint) if method == "GET" else None
+        key = entry = None
+        headers = {}
+        if ttl is not None:
+            key = self._cache_key(endpoint, params)
+            entry = self._cache_get(key)
+            if entry and entry.fresh:
+                self.cache.hits += 1
+                CACHE_LOOKUPS.inc(result="hit")
+                return entry.value
+            self.cache.misses += 1
+            CACHE_LOOKUPS.inc(result="stale" if entry else "miss")
+            if entry and entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry and entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
         
         for attempt in range(3):
+            if attempt:
+                RETRIES.inc(endpoint=label)
+            try:
+                self.breaker.allow()
+            except CircuitOpenError:
+                if entry:
+                    logger.warning(f"Motion unavailable, serving cached {endpoint}")
+                    return entry.value
+                raise
+            self.rate_limiter.acquire("motion")
             try:
-                response = self.session.request(
-                    method=method,
-                    url=url,
-                    params=params,
-                    json=json_data,
-                    timeout=30
-                )
+                started = time.perf_counter()
+                try:
+                    response = self.session.request(
+                        method=method,
+                        url=url,
+                        params=params,
+                        json=json_data,
+                        headers=headers or None,
+                        timeout=self.transport.timeout
+                    )
+                finally:
+                    REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=label)
+                REQUESTS.inc(endpoint=label, status=response.status_code)
+                if response.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
                 
                 if response.status_code == 429:  # Rate limit
+                    self.rate_limit_hits += 1
+                    RATE_LIMITED.inc(endpoint=label)
                     logger.warning("Rate limit hit, waiting 10 seconds...")
                     time.sleep(10)
                     continue
                 
+                if response.status_code == 304 and entry:
+                    self.cache.revalidated += 1
+                    entry.expires_at = time.time() + ttl
+                    self._cache_set(key, entry)
+                    return entry.value
+                
                 response.raise_for_status()
-                return response.json()
+                data = (decode or loads)(response.content)
+                if key:
+                    self._cache_set(key, CacheEntry(
+                        value=data,
+                        expires_at=time.time() + ttl,
+                        etag=response.headers.get("ETag"),
+                        last_modified=response.headers.get("Last-Modified"),
+                    ))
+                return data
                 
             except requests.exceptions.RequestException as e:
+                if e.response is None:
+                    REQUESTS.inc(endpoint=label, status="error")
+                    self.breaker.record_failure()
                 logger.error(f"Request failed (attempt {attempt + 1}/3): {e}")
                 if attempt < 2:
                     time.sleep(2 ** attempt)  # Exponential backoff
                 else:
                     raise
+        
+        raise requests.exceptions.RetryError(f"Motion kept rate limiting {endpoint}")
     
-    def get_tasks(self, workspace_id: str, include_all_statuses: bool = True, 
-                  cursor: Optional[str] = None) -> List[Dict]:
-        """Get all tasks from a workspace"""
-        all_tasks = []
+    async def _make_request_async(self, method: str, endpoint: str, params: Optional[Dict] = None,
+                                  json_data: Optional[Dict] = None) -> Dict:
+        """Async variant of _make_request, run on a worker thread"""
+        return await asyncio.to_thread(self._make_request, method, endpoint, params, json_data)
+    
+    def _iter_pages(self, endpoint: str, params: Dict, key: str,
+                    cursor: Optional[str] = None, prefetch: bool = True,
+                    stop: Optional[Callable[[List[Dict]], bool]] = None,
+                    decode: Optional[Callable[[bytes], Dict]] = None) -> Iterator[List[Dict]]:
+        """Yield the items of a cursor-paginated listing one page at a time
+
+        As soon as a page arrives its next cursor is requested in the
+        background, so the following page downloads while the caller works
+        on this one. ``stop`` may end pagination early after a page.
         
-        while True:
-            params = {
-                "workspaceId": workspace_id,
-                "includeAllStatuses": str(include_all_statuses).lower()
-            }
-            
-            if cursor:
-                params["cursor"] = cursor
-            
+        A failed page raises rather than ending the listing early, so callers
+        never mistake a partial scan for a complete one.
+        """
+        def fetch(page_cursor):
+            page_params = dict(params)
+            if page_cursor:
+                page_params["cursor"] = page_cursor
+            return self._make_request("GET", endpoint, params=page_params, decode=decode)
+        
+        total = 0
+        pending = None
+        try:
             try:
-                response = self._make_request("GET", "/tasks", params=params)
-                
-                tasks = response.get("tasks", [])
-                all_tasks.extend(tasks)
+                response = fetch(cursor)
+            except Exception as e:
+                logger.error(f"Error fetching {key}: {e}")
+                raise
+            
+            while True:
+                items = response.get(key, [])
+                total += len(items)
                 
                 # Check if there are more pages
                 meta = response.get("meta", {})
                 cursor = meta.get("nextCursor")
+                if cursor and stop and stop(items):
+                    logger.info(f"Reached {key} older than the watermark, stopping pagination")
+                    cursor = None
+                
+                if cursor:
+                    logger.info(f"Retrieved {len(items)} {key}, fetching next page...")
+                    if prefetch:
+                        pending = self.prefetch_executor.submit(fetch, cursor)
+                
+                yield items
                 
                 if not cursor:
                     break
-                    
-                logger.info(f"Retrieved {len(tasks)} tasks, fetching next page...")
                 
-            except Exception as e:
-                logger.error(f"Error fetching tasks: {e}")
-                break
+                try:
+                    response = pending.result() if pending else fetch(cursor)
+                    pending = None
+                except Exception as e:
+                    logger.error(f"Error fetching {key} after {total} items, aborting the listing: {e}")
+                    raise
+        finally:
+            if pending:
+                pending.cancel()
+            logger.info(f"Retrieved total of {total} {key}")
+    
+    def iter_task_pages(self, workspace_id: str, include_all_statuses: bool = True,
+                        cursor: Optional[str] = None, statuses: Optional[List[str]] = None,
+                        completed_since: Optional[datetime] = None,
+                        fields: Optional[Iterable[str]] = None,
+                        prefetch: bool = True) -> Iterator[List[Dict]]:
+        """Yield a workspace's tasks page by page
+
+        When ``statuses`` is given the status filter is applied server-side
+        (Motion does not allow it together with ``includeAllStatuses``).
+        When ``completed_since`` is given, paging stops after the first page
+        that contains no task completed after that time. ``fields`` keeps
+        only the listed keys of each task.
+        
+        Tasks are TaskRecords: read-only mappings whose payload beyond the id
+        and completion fields is only decoded when something reads it.
+        """
+        params = {"workspaceId": workspace_id}
+        if statuses:
+            params["status"] = statuses
+        else:
+            params["includeAllStatuses"] = str(include_all_statuses).lower()
+        if self.page_size:
+            params["limit"] = self.page_size
+        
+        stop = None
+        if completed_since:
+            since = to_epoch_ms(completed_since)
+            stop = lambda tasks: not any(self._completed_after(task, since) for task in tasks)
+        
+        projection = tuple(fields) if fields else None
+        yield from self._iter_pages(
+            "/tasks", params, "tasks", cursor, prefetch, stop,
+            decode=lambda data: decode_task_page(data, projection)
+        )
+    
+    def iter_tasks(self, workspace_id: str, include_all_statuses: bool = True,
+                   cursor: Optional[str] = None, statuses: Optional[List[str]] = None,
+                   completed_since: Optional[datetime] = None,
+                   fields: Optional[Iterable[str]] = None,
+                   prefetch: bool = True) -> Iterator[Dict]:
+        """Yield a workspace's tasks as pages arrive; see iter_task_pages"""
+        for tasks in self.iter_task_pages(workspace_id, include_all_statuses, cursor, statuses,
+                                          completed_since, fields, prefetch):
+            yield from tasks
+    
+    async def aiter_task_pages(self, workspace_id: str, include_all_statuses: bool = True,
+                               cursor: Optional[str] = None, statuses: Optional[List[str]] = None,
+                               completed_since: Optional[datetime] = None,
+                               fields: Optional[Iterable[str]] = None) -> AsyncIterator[List[Dict]]:
+        """Async variant of iter_task_pages"""
+        pages = self.iter_task_pages(workspace_id, include_all_statuses, cursor, statuses,
+                                     completed_since, fields)
+        try:
+            while True:
+                tasks = await asyncio.to_thread(next, pages, None)
+                if tasks is None:
+                    break
+                yield tasks
+        finally:
+            pages.close()
+    
+    async def aiter_task_pages_by_status(self, workspace_id: str, statuses: List[str],
+                                         fields: Optional[Iterable[str]] = None,
+                                         concurrency: int = 4) -> AsyncIterator[List[Dict]]:
+        """Scan a workspace as one shard per status, several shards at a time
+
+        Every task has exactly one status, so the shards together cover the
+        workspace once with no overlap. Pages are yielded as they arrive from
+        any shard; an error in one shard is raised once the others stop.
+        """
+        queue = asyncio.Queue(maxsize=concurrency * 2)
+        semaphore = asyncio.Semaphore(concurrency)
+        done = object()
+        
+        async def shard(status):
+            try:
+                async with semaphore:
+                    async for tasks in self.aiter_task_pages(workspace_id, statuses=[status], fields=fields):
+                        await queue.put(tasks)
+            finally:
+                await queue.put(done)
         
-        logger.info(f"Retrieved total of {len(all_tasks)} tasks")
-        return all_tasks
+        workers = [asyncio.create_task(shard(status)) for status in statuses]
+        try:
+            remaining = len(workers)
+            while remaining:
+                item = await queue.get()
+                if item is done:
+                    remaining -= 1
+                else:
+                    yield item
+            for result in await asyncio.gather(*workers, return_exceptions=True):
+                if isinstance(result, Exception):
+                    raise result
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    
+    def get_tasks(self, workspace_id: str, include_all_statuses: bool = True, 
+                  cursor: Optional[str] = None, statuses: Optional[List[str]] = None,
+                  completed_since: Optional[datetime] = None) -> List[Dict]:
+        """Get tasks from a workspace; see iter_task_pages for the filters"""
+        return list(self.iter_tasks(workspace_id, include_all_statuses, cursor, statuses,
+                                    completed_since))
+    
+    async def get_tasks_async(self, workspace_id: str, include_all_statuses: bool = True,
+                              cursor: Optional[str] = None, statuses: Optional[List[str]] = None,
+                              completed_since: Optional[datetime] = None) -> List[Dict]:
+        """Async variant of get_tasks, so several workspaces can page at once"""
+        return await asyncio.to_thread(
+            self.get_tasks, workspace_id, include_all_statuses, cursor, statuses, completed_since
+        )
+    
+    @staticmethod
+    def _completed_after(task: Dict, since: int) -> bool:
+        """Check whether a task was completed after the given epoch milliseconds"""
+        completed = parse_timestamp(task.get("completedTime"))
+        return completed is not None and completed > since
+    
+    def get_statuses(self, workspace_id: str) -> List[Dict]:
+        """Get the task statuses defined in a workspace"""
+        try:
+            response = self._make_request("GET", "/statuses", params={"workspaceId": workspace_id})
+            # The endpoint returns a bare list; tolerate a wrapped one as well
+            if isinstance(response, dict):
+                return response.get("statuses", [])
+            return response or []
+        except Exception as e:
+            logger.error(f"Error fetching statuses: {e}")
+            return []
+    
+    def get_resolved_statuses(self, workspace_id: str) -> List[str]:
+        """Get the names of the statuses that mark a task as resolved"""
+        return [
+            status.get("name") for status in self.get_statuses(workspace_id)
+            if status.get("isResolvedStatus") and status.get("name")
+        ]
+    
+    async def get_resolved_statuses_async(self, workspace_id: str) -> List[str]:
+        """Async variant of get_resolved_statuses"""
+        return await asyncio.to_thread(self.get_resolved_statuses, workspace_id)
     
     def get_user_info(self) -> Dict:
         """Get current user information"""
@@ -107,33 +406,35 @@ class MotionClient:
             logger.error(f"Error fetching task {task_id}: {e}")
             return {}
     
+    def get_project(self, project_id: str) -> Dict:
+        """Get a project by ID, served from the cache when fresh"""
+        try:
+            return self._make_request("GET", f"/projects/{project_id}")
+        except Exception as e:
+            logger.error(f"Error fetching project {project_id}: {e}")
+            return {}
+    
+    def get_projects(self, workspace_id: str) -> List[Dict]:
+        """Get all projects in a workspace"""
+        return [
+            project
+            for projects in self._iter_pages("/projects", {"workspaceId": workspace_id}, "projects")
+            for project in projects
+        ]
+    
+    def get_users(self, workspace_id: str) -> List[Dict]:
+        """Get the users of a workspace"""
+        return [
+            user
+            for users in self._iter_pages("/users", {"workspaceId": workspace_id}, "users")
+            for user in users
+        ]
+    
+    def iter_workspaces(self, cursor: Optional[str] = None, prefetch: bool = True) -> Iterator[Dict]:
+        """Yield the workspaces the user is part of as pages arrive"""
+        for workspaces in self._iter_pages("/workspaces", {}, "workspaces", cursor, prefetch):
+            yield from workspaces
+    
     def get_workspaces(self, cursor: Optional[str] = None) -> List[Dict]:
         """Get all workspaces the user is part of"""
-        all_workspaces = []
-        
-        while True:
-            params = {}
-            if cursor:
-                params["cursor"] = cursor
-            
-            try:
-                response = self._make_request("GET", "/workspaces", params=params)
-                
-                workspaces = response.get("workspaces", [])
-                all_workspaces.extend(workspaces)
-                
-                # Check if there are more pages
-                meta = response.get("meta", {})
-                cursor = meta.get("nextCursor")
-                
-                if not cursor:
-                    break
-                    
-                logger.info(f"Retrieved {len(workspaces)} workspaces, fetching next page...")
-                
-            except Exception as e:
-                logger.error(f"Error fetching workspaces: {e}")
-                break
-        
-        logger.info(f"Retrieved total of {len(all_workspaces)} workspaces")
-        return all_workspaces
\ No newline at end of file
+        return list(self.iter_workspaces(cursor))
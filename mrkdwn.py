@@ -0,0 +1,277 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple
+
+# Token kinds produced by the converter
+TEXT = "text"
+OPEN = "open"
+CLOSE = "close"
+NEWLINE = "newline"
+ATOM = "atom"  # Rendered whole or not at all, e.g. links
+LINK = "link"  # Placeholder where an anchor starts; never rendered
+PREFIX = "prefix"  # List bullet or quote marker starting a line
+
+INLINE_MARKERS = {
+    "strong": "*", "b": "*",
+    "em": "_", "i": "_",
+    "s": "~", "strike": "~", "del": "~",
+    "code": "`",
+}
+BLOCK_TAGS = {"p", "div", "section", "article", "header", "footer", "table", "tr"}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+WHITESPACE = re.compile(r"\s+")
+
+
+def escape(text: str) -> str:
+    """Escape the characters Slack treats as control sequences"""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+class _Converter(HTMLParser):
+    """Single pass over the HTML, emitting a flat token stream"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tokens: List[Tuple[str, str]] = []
+        self.lists: List[List] = []
+        self.links: List[Tuple[Optional[str], int]] = []
+        self.pre_depth = 0
+
+    def _newline(self):
+        """End the current line, dropping trailing spaces and blank lines"""
+        if self._after_prefix():
+            self.tokens[-1] = (TEXT, self.tokens[-1][1])
+        if self.tokens and self.tokens[-1][0] == TEXT:
+            text = self.tokens[-1][1].rstrip(" ")
+            if text:
+                self.tokens[-1] = (TEXT, text)
+            else:
+                self.tokens.pop()
+        if self.tokens and self.tokens[-1][0] != NEWLINE:
+            self.tokens.append((NEWLINE, "\n"))
+
+    def _at_line_start(self) -> bool:
+        return not self.tokens or self.tokens[-1][0] == NEWLINE
+
+    def _after_prefix(self) -> bool:
+        """Whether the current line holds nothing but a bullet or quote marker"""
+        return bool(self.tokens) and self.tokens[-1][0] == PREFIX
+
+    def _block(self):
+        """Start a block on its own line, unless it is the first thing in a list item or quote"""
+        if not self._after_prefix():
+            self._newline()
+
+    def handle_starttag(self, tag, attrs):
+        if tag in INLINE_MARKERS:
+            if not self.pre_depth:
+                self.tokens.append((OPEN, INLINE_MARKERS[tag]))
+        elif tag == "br":
+            if self.pre_depth:
+                self.tokens.append((TEXT, "\n"))
+            else:
+                self._newline()
+        elif tag in BLOCK_TAGS:
+            self._block()
+        elif tag == "blockquote":
+            self._newline()
+            self.tokens.append((PREFIX, "> "))
+        elif tag in HEADING_TAGS:
+            self._block()
+            self.tokens.append((OPEN, "*"))
+        elif tag == "pre":
+            self._newline()
+            self.tokens.append((OPEN, "```"))
+            self.tokens.append((NEWLINE, "\n"))
+            self.pre_depth += 1
+        elif tag in ("ul", "ol"):
+            self._block()
+            self.lists.append([tag, 0])
+        elif tag == "li":
+            self._newline()
+            indent = "    " * max(len(self.lists) - 1, 0)
+            if self.lists and self.lists[-1][0] == "ol":
+                self.lists[-1][1] += 1
+                bullet = f"{self.lists[-1][1]}. "
+            else:
+                bullet = "• "
+            self.tokens.append((PREFIX, indent + bullet))
+        elif tag == "a":
+            self.links.append((dict(attrs).get("href"), len(self.tokens)))
+            self.tokens.append((LINK, ""))
+
+    def handle_endtag(self, tag):
+        if tag in INLINE_MARKERS:
+            if not self.pre_depth:
+                self._close(INLINE_MARKERS[tag])
+        elif tag in BLOCK_TAGS or tag in ("li", "blockquote"):
+            self._newline()
+        elif tag in HEADING_TAGS:
+            self._close("*")
+            self._newline()
+        elif tag == "pre":
+            self.pre_depth = max(self.pre_depth - 1, 0)
+            if self.tokens and self.tokens[-1][0] == TEXT:
+                self.tokens[-1] = (TEXT, self.tokens[-1][1].rstrip("\n"))
+            self.tokens.append((NEWLINE, "\n"))
+            self.tokens.append((CLOSE, "```"))
+            self.tokens.append((NEWLINE, "\n"))
+        elif tag in ("ul", "ol"):
+            if self.lists:
+                self.lists.pop()
+            self._newline()
+        elif tag == "a" and self.links:
+            self._close_link(*self.links.pop())
+
+    def _close(self, marker: str):
+        """Close an inline marker, keeping whitespace outside it"""
+        if self.tokens and self.tokens[-1] == (OPEN, marker):
+            # Nothing was formatted; drop the pair instead of emitting "**"
+            self.tokens.pop()
+            return
+        trailing = ""
+        if self.tokens and self.tokens[-1][0] == TEXT:
+            text = self.tokens[-1][1]
+            stripped = text.rstrip(" ")
+            trailing = text[len(stripped):]
+            self.tokens[-1] = (TEXT, stripped)
+        self.tokens.append((CLOSE, marker))
+        if trailing:
+            self.tokens.append((TEXT, trailing))
+
+    def _close_link(self, href: Optional[str], start: int):
+        """Collapse the tokens inside an anchor into one Slack link"""
+        label = "".join(value for kind, value in self.tokens[start:] if kind == TEXT).strip()
+        del self.tokens[start:]
+        if not href or href.startswith(("javascript:", "#")):
+            if label:
+                self.tokens.append((TEXT, label))
+            return
+        href = href.replace("|", "%7C").replace(">", "%3E").replace("<", "%3C")
+        self.tokens.append((ATOM, f"<{href}|{label}>" if label and label != href else f"<{href}>"))
+
+    def handle_data(self, data):
+        if self.pre_depth:
+            self.tokens.append((TEXT, escape(data)))
+            return
+        text = WHITESPACE.sub(" ", data)
+        if self._at_line_start() or self._after_prefix():
+            text = text.lstrip(" ")
+        if not text:
+            return
+        text = escape(text)
+        if self.tokens and self.tokens[-1][0] == OPEN and text.startswith(" "):
+            # Slack only formats markers that hug the text
+            marker = self.tokens.pop()
+            self._append_text(" ")
+            self.tokens.append(marker)
+            text = text.lstrip(" ")
+        self._append_text(text)
+
+    def _append_text(self, text: str):
+        if self.tokens and self.tokens[-1][0] == TEXT:
+            self.tokens[-1] = (TEXT, self.tokens[-1][1] + text)
+        else:
+            self.tokens.append((TEXT, text))
+
+
+def _render(tokens: List[Tuple[str, str]], limit: Optional[int]) -> str:
+    """Join tokens, truncating on a token boundary with formatting closed"""
+    while tokens and tokens[-1][0] == NEWLINE:
+        tokens.pop()
+    while tokens and tokens[0][0] == NEWLINE:
+        tokens.pop(0)
+
+    out = []
+    length = 0
+    open_markers = []
+    budget = None if limit is None else limit - 1  # Room for the ellipsis
+
+    for kind, value in tokens:
+        closing = sum(len(marker) for marker in open_markers)
+        if budget is not None and length + len(value) + closing > budget:
+            room = budget - length - closing
+            if kind == TEXT and room > 0:
+                cut = value[:room]
+                if " " in cut.strip():
+                    cut = cut[:cut.rstrip().rfind(" ")]
+                # Never split an escaped entity such as &amp;
+                amp = cut.rfind("&")
+                if amp != -1 and ";" not in cut[amp:]:
+                    cut = cut[:amp]
+                if cut.rstrip():
+                    out.append(cut.rstrip())
+            while out and out[-1] in open_markers[-1:]:
+                # Don't leave an opening marker with nothing inside it
+                out.pop()
+                open_markers.pop()
+            out.extend(reversed(open_markers))
+            out.append("…")
+            return "".join(out).strip()
+
+        if kind == OPEN:
+            open_markers.append(value)
+        elif kind == CLOSE and value in open_markers:
+            # Close any markers opened inside this one first
+            while open_markers and open_markers[-1] != value:
+                out.append(open_markers.pop())
+                length += 1
+            open_markers.pop()
+        elif kind in (CLOSE, LINK):
+            continue
+        out.append(value)
+        length += len(value)
+
+    out.extend(reversed(open_markers))
+    return "".join(out).strip()
+
+
+class _LRU:
+    """Thread-safe LRU cache keyed by description digest"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is not None:
+                self.items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+
+_cache = _LRU(2048)
+
+
+def html_to_mrkdwn(html: str, limit: Optional[int] = None) -> str:
+    """Convert task description HTML to Slack mrkdwn
+
+    Results are cached by a digest of the HTML so unchanged descriptions are
+    not reconverted. ``limit`` truncates the output on a token boundary,
+    closing any open formatting and appending an ellipsis.
+    """
+    if not html:
+        return ""
+    key = (hashlib.blake2b(html.encode("utf-8"), digest_size=16).digest(), limit)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    converter = _Converter()
+    converter.feed(html)
+    converter.close()
+    result = _render(converter.tokens, limit)
+    _cache.put(key, result)
+    return result
@@ -0,0 +1,151 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Slack Web API rate-limit tiers, in requests per minute
+SLACK_TIERS = {1: 1, 2: 20, 3: 50, 4: 100}
+
+# Per-method limits for the Slack methods this integration calls. chat.postMessage
+# is limited to roughly one message per second per channel rather than by tier.
+SLACK_METHOD_LIMITS = {
+    "chat.postMessage": 60,
+    "auth.test": SLACK_TIERS[4],
+}
+
+
+class TokenBucket:
+    """Token bucket that keeps any rolling minute within a per-minute quota"""
+
+    def __init__(self, per_minute: float, burst: float = 1):
+        self.capacity = max(1.0, min(burst, per_minute))
+        # Refill slowly enough that a full burst plus a minute of refill
+        # never exceeds the quota
+        self.rate = max(per_minute - self.capacity, 1.0) / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+
+    def _refill(self, now: float):
+        """Add the tokens accrued since the last update"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token and return how long the caller must wait before using it"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            if wait:
+                self.waits += 1
+                self.wait_seconds_total += wait
+            return wait
+
+    def acquire(self) -> float:
+        """Block until a token is available; returns the time waited"""
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def snapshot(self) -> Dict:
+        """Current fill level and accumulated wait time"""
+        with self.lock:
+            self._refill(time.monotonic())
+            return {
+                "tokens": round(self.tokens, 3),
+                "capacity": self.capacity,
+                "fill_ratio": round(max(self.tokens, 0) / self.capacity, 3),
+                "next_wait_seconds": round((1 - self.tokens) / self.rate, 3) if self.tokens < 1 else 0.0,
+                "waits": self.waits,
+                "wait_seconds_total": round(self.wait_seconds_total, 3),
+            }
+
+
+class RateLimiter:
+    """Proactive limiter holding one token bucket per endpoint key
+
+    Keys are colon-separated from general to specific, e.g.
+    ``slack:chat.postMessage:#dev-rel``. A key uses the limit configured for
+    its longest configured prefix and gets its own bucket, so configuring
+    ``slack:chat.postMessage`` gives every channel a separate allowance.
+    """
+
+    def __init__(self):
+        self.limits = {}
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def configure(self, prefix: str, per_minute: float, burst: float = 1):
+        """Set the per-minute quota for keys starting with a prefix"""
+        self.limits[prefix] = (per_minute, burst)
+
+    def _limit_for(self, key: str):
+        """Find the limit of the longest configured prefix of a key"""
+        parts = key.split(":")
+        while parts:
+            limit = self.limits.get(":".join(parts))
+            if limit:
+                return limit
+            parts.pop()
+        return None
+
+    def bucket(self, key: str) -> Optional[TokenBucket]:
+        """Get or create the bucket for a key; None when the key is unlimited"""
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                limit = self._limit_for(key)
+                if limit is None:
+                    return None
+                bucket = self.buckets[key] = TokenBucket(*limit)
+            return bucket
+
+    def acquire(self, key: str) -> float:
+        """Wait for permission to make one request against a key"""
+        bucket = self.bucket(key)
+        if bucket is None:
+            return 0.0
+        wait = bucket.acquire()
+        if wait >= 1:
+            logger.info(f"Rate limiter paced {key} by {wait:.1f}s")
+        return wait
+
+    def metrics(self) -> Dict[str, Dict]:
+        """Fill level and wait statistics for every bucket in use"""
+        with self.lock:
+            buckets = dict(self.buckets)
+        return {key: bucket.snapshot() for key, bucket in buckets.items()}
+
+
+def build_rate_limiter() -> RateLimiter:
+    """Create a limiter configured with Motion's quota and Slack's method tiers"""
+    limiter = RateLimiter()
+    limiter.configure(
+        "motion",
+        float(os.environ.get('MOTION_RATE_LIMIT', 12)),
+        float(os.environ.get('MOTION_RATE_BURST', 3))
+    )
+    limiter.configure("slack", SLACK_TIERS[3], 3)
+    for method, per_minute in SLACK_METHOD_LIMITS.items():
+        limiter.configure(f"slack:{method}", per_minute, 1)
+    return limiter
+
+
+_default_limiter = None
+_default_lock = threading.Lock()
+
+
+def get_default_limiter() -> RateLimiter:
+    """Process-wide limiter shared by every client that isn't given one"""
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = build_rate_limiter()
+        return _default_limiter
@@ -0,0 +1,88 @@
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Route:
+    """Sends completions from one workspace, optionally filtered, to Slack channels"""
+    workspace_id: str
+    channels: List[str]
+    projects: List[str] = field(default_factory=list)
+    labels: List[str] = field(default_factory=list)
+
+    def matches(self, task: Dict) -> bool:
+        """Check whether a task passes this route's project and label filters"""
+        if self.projects:
+            project = task.get('project') or {}
+            if project.get('id') not in self.projects and project.get('name') not in self.projects:
+                return False
+        if self.labels:
+            task_labels = {
+                label.get('name') if isinstance(label, dict) else label
+                for label in task.get('labels') or []
+            }
+            if not task_labels.intersection(self.labels):
+                return False
+        return True
+
+
+def load_routes(path: Optional[str], default_workspace_id: Optional[str],
+                default_channel: str) -> List[Route]:
+    """Load routes from a JSON config file, or build one from the environment
+
+    The file looks like::
+
+        {"routes": [{"workspace_id": "...", "channels": ["#dev-rel"],
+                     "projects": ["Website"], "labels": ["release"]}]}
+
+    ``projects`` matches project ids or names; ``channel`` may be used
+    instead of ``channels`` for a single channel.
+    """
+    if not path:
+        if not default_workspace_id:
+            raise ValueError("Either ROUTES_FILE or MOTION_WORKSPACE_ID must be set")
+        return [Route(workspace_id=default_workspace_id, channels=[default_channel])]
+
+    with open(path, 'r') as f:
+        config = json.load(f)
+
+    routes = []
+    for entry in config.get('routes', []):
+        workspace_id = entry.get('workspace_id') or default_workspace_id
+        channels = entry.get('channels') or [entry.get('channel') or default_channel]
+        if not workspace_id:
+            raise ValueError(f"Route is missing workspace_id: {entry}")
+        routes.append(Route(
+            workspace_id=workspace_id,
+            channels=list(channels),
+            projects=list(entry.get('projects', [])),
+            labels=list(entry.get('labels', [])),
+        ))
+
+    if not routes:
+        raise ValueError(f"No routes defined in {path}")
+    logger.info(f"Loaded {len(routes)} routes from {path}")
+    return routes
+
+
+def group_by_workspace(routes: List[Route]) -> Dict[str, List[Route]]:
+    """Group routes by the workspace they poll"""
+    grouped = {}
+    for route in routes:
+        grouped.setdefault(route.workspace_id, []).append(route)
+    return grouped
+
+
+def channels_for(task: Dict, routes: List[Route]) -> List[str]:
+    """Return the distinct channels a task should be posted to"""
+    channels = []
+    for route in routes:
+        if route.matches(task):
+            for channel in route.channels:
+                if channel not in channels:
+                    channels.append(channel)
+    return channels
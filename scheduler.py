@@ -0,0 +1,125 @@
+import os
+import time
+import random
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def parse_active_hours(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Parse an ``ACTIVE_HOURS`` value such as ``9-18`` into (start, end) hours"""
+    if not value:
+        return None
+    start, end = value.split('-', 1)
+    return int(start), int(end)
+
+
+class AdaptiveSchedule:
+    """Poll interval for one workspace that follows activity and errors
+
+    A poll that finds completions drops the interval to ``min_interval``; each
+    idle poll stretches it by ``idle_factor`` up to ``max_interval``; errors and
+    rate limiting back off by ``error_factor``. During ``active_hours`` the
+    interval never exceeds ``base_interval``.
+    """
+
+    def __init__(self, base_interval: float, min_interval: float, max_interval: float,
+                 idle_factor: float = 1.5, error_factor: float = 2.0, jitter: float = 0.1,
+                 active_hours: Optional[Tuple[int, int]] = None):
+        self.base_interval = base_interval
+        self.min_interval = min(min_interval, base_interval)
+        self.max_interval = max(max_interval, base_interval)
+        self.idle_factor = idle_factor
+        self.error_factor = error_factor
+        self.jitter = jitter
+        self.active_hours = active_hours
+        self.interval = base_interval
+        self.consecutive_errors = 0
+        self.next_due = time.monotonic()
+
+    def _in_active_hours(self) -> bool:
+        """Whether the local time falls inside the configured active hours"""
+        if not self.active_hours:
+            return False
+        start, end = self.active_hours
+        hour = datetime.now().hour
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end
+
+    def record(self, completions: int = 0, error: bool = False, rate_limited: bool = False) -> float:
+        """Update the interval from a poll's outcome and schedule the next poll"""
+        if error or rate_limited:
+            self.consecutive_errors += 1
+            self.interval = max(self.interval, self.base_interval) * self.error_factor
+        else:
+            self.consecutive_errors = 0
+            if completions:
+                self.interval = self.min_interval
+            else:
+                self.interval *= self.idle_factor
+                if self._in_active_hours():
+                    self.interval = min(self.interval, self.base_interval)
+
+        self.interval = max(self.min_interval, min(self.max_interval, self.interval))
+        delay = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        self.next_due = time.monotonic() + delay
+        return delay
+
+
+class PollScheduler:
+    """Tracks an adaptive schedule per workspace"""
+
+    def __init__(self, workspace_ids: Iterable[str], base_interval: float,
+                 min_interval: Optional[float] = None, max_interval: Optional[float] = None,
+                 jitter: float = 0.1, active_hours: Optional[Tuple[int, int]] = None):
+        min_interval = base_interval if min_interval is None else min_interval
+        max_interval = base_interval if max_interval is None else max_interval
+        self.schedules: Dict[str, AdaptiveSchedule] = {
+            workspace_id: AdaptiveSchedule(
+                base_interval, min_interval, max_interval,
+                jitter=jitter, active_hours=active_hours
+            )
+            for workspace_id in workspace_ids
+        }
+
+    @classmethod
+    def from_env(cls, workspace_ids: Iterable[str], base_interval: float,
+                 adaptive: bool = True) -> 'PollScheduler':
+        """Build a scheduler from the POLL_* environment variables"""
+        if not adaptive:
+            return cls(workspace_ids, base_interval, jitter=0)
+        return cls(
+            workspace_ids,
+            base_interval,
+            min_interval=float(os.environ.get('POLL_MIN_INTERVAL', 15)),
+            max_interval=float(os.environ.get('POLL_MAX_INTERVAL', 600)),
+            jitter=float(os.environ.get('POLL_JITTER', 0.1)),
+            active_hours=parse_active_hours(os.environ.get('ACTIVE_HOURS')),
+        )
+
+    def due(self) -> List[str]:
+        """Workspaces whose next poll is due now"""
+        now = time.monotonic()
+        return [
+            workspace_id for workspace_id, schedule in self.schedules.items()
+            if schedule.next_due <= now
+        ]
+
+    def seconds_until_next(self) -> float:
+        """How long to sleep before any workspace is due"""
+        next_due = min(schedule.next_due for schedule in self.schedules.values())
+        return max(0.0, next_due - time.monotonic())
+
+    def defer(self, workspace_id: str, delay: float):
+        """Push a workspace's next poll out without counting it as a poll outcome"""
+        self.schedules[workspace_id].next_due = time.monotonic() + delay
+
+    def record(self, workspace_id: str, completions: int = 0, error: bool = False,
+               rate_limited: bool = False):
+        """Record a poll outcome for a workspace"""
+        schedule = self.schedules[workspace_id]
+        delay = schedule.record(completions, error, rate_limited)
+        logger.info(f"Next poll of workspace {workspace_id} in {delay:.0f}s")
@@ -1,59 +1,131 @@
+import asyncio
+import os
 import requests
 import logging
 import time
 from typing import Dict, Optional
 
+from circuit_breaker import get_breaker
+from metrics import get_registry
+from rate_limiter import RateLimiter, get_default_limiter
+from transport import TransportConfig, build_session
+
 logger = logging.getLogger(__name__)
 
+_metrics = get_registry()
+REQUEST_SECONDS = _metrics.histogram("slack_request_duration_seconds", "Slack API request latency by method")
+REQUESTS = _metrics.counter("slack_requests_total", "Slack API responses by method and status")
+RETRIES = _metrics.counter("slack_retries_total", "Slack API requests retried by method")
+RATE_LIMITED = _metrics.counter("slack_rate_limited_total", "Slack API rate-limited responses by method")
+
+# Errors that no retry can fix: the channel, the bot's membership or the message itself is wrong
+PERMANENT_ERRORS = {
+    "channel_not_found", "not_in_channel", "is_archived", "msg_too_long", "invalid_blocks",
+    "invalid_blocks_format", "no_text", "restricted_action", "cannot_reply_to_message",
+}
+
+
+class SlackAPIError(Exception):
+    """Slack answered ``ok: false``; ``error`` holds its error code"""
+
+    def __init__(self, error: str):
+        super().__init__(f"Slack API error: {error}")
+        self.error = error
+
+    @property
+    def permanent(self) -> bool:
+        return self.error in PERMANENT_ERRORS
+
+
 class SlackClient:
-    def __init__(self, bot_token: str):
+    def __init__(self, bot_token: str, rate_limiter: Optional[RateLimiter] = None,
+                 transport: Optional[TransportConfig] = None):
         self.bot_token = bot_token
-        self.base_url = "https://slack.com/api"
+        self.base_url = os.environ.get("SLACK_API_URL", "https://slack.com/api").rstrip("/")
         self.headers = {
             "Authorization": f"Bearer {bot_token}",
             "Content-Type": "application/json"
         }
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        self.transport = transport or TransportConfig.from_env()
+        self.session = build_session(self.transport, self.headers)
+        self.rate_limiter = rate_limiter or get_default_limiter()
+        self.breaker = get_breaker("slack")
     
     def _make_request(self, method: str, endpoint: str, json_data: Optional[Dict] = None) -> Dict:
         """Make a request to the Slack API with retry logic"""
         url = f"{self.base_url}/{endpoint}"
+        rate_limit_key = f"slack:{endpoint}"
+        if endpoint == "chat.postMessage" and json_data and json_data.get("channel"):
+            # Posting is limited per channel rather than per workspace
+            rate_limit_key += f":{json_data['channel']}"
         
         for attempt in range(3):
+            if attempt:
+                RETRIES.inc(method=endpoint)
+            # Raises CircuitOpenError while Slack is considered down
+            self.breaker.allow()
+            self.rate_limiter.acquire(rate_limit_key)
             try:
-                response = self.session.request(
-                    method=method,
-                    url=url,
-                    json=json_data,
-                    timeout=30
-                )
+                started = time.perf_counter()
+                try:
+                    response = self.session.request(
+                        method=method,
+                        url=url,
+                        json=json_data,
+                        timeout=self.transport.timeout
+                    )
+                finally:
+                    REQUEST_SECONDS.observe(time.perf_counter() - started, method=endpoint)
+                if response.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                if response.status_code == 429:
+                    RATE_LIMITED.inc(method=endpoint)
+                    REQUESTS.inc(method=endpoint, status=429)
+                    retry_after = int(response.headers.get("Retry-After", 10))
+                    logger.warning(f"Rate limited, waiting {retry_after} seconds...")
+                    time.sleep(retry_after)
+                    continue
                 
                 response.raise_for_status()
                 data = response.json()
+                REQUESTS.inc(method=endpoint, status="ok" if data.get("ok") else data.get("error", "error"))
                 
                 if not data.get("ok"):
                     error = data.get("error", "Unknown error")
                     logger.error(f"Slack API error: {error}")
                     if error == "ratelimited":
+                        RATE_LIMITED.inc(method=endpoint)
                         retry_after = int(response.headers.get("Retry-After", 10))
                         logger.warning(f"Rate limited, waiting {retry_after} seconds...")
                         time.sleep(retry_after)
                         continue
                     else:
-                        raise Exception(f"Slack API error: {error}")
+                        raise SlackAPIError(error)
                 
                 return data
                 
             except requests.exceptions.RequestException as e:
+                status = e.response.status_code if e.response is not None else "error"
+                REQUESTS.inc(method=endpoint, status=status)
+                if e.response is None:
+                    self.breaker.record_failure()
                 logger.error(f"Request failed (attempt {attempt + 1}/3): {e}")
                 if attempt < 2:
                     time.sleep(2 ** attempt)  # Exponential backoff
                 else:
                     raise
+        
+        raise requests.exceptions.RetryError(f"Slack kept rate limiting {endpoint}")
+    
+    async def _make_request_async(self, method: str, endpoint: str, json_data: Optional[Dict] = None) -> Dict:
+        """Async variant of _make_request, run on a worker thread"""
+        return await asyncio.to_thread(self._make_request, method, endpoint, json_data)
     
-    def post_message(self, channel: str, text: str, blocks: Optional[list] = None) -> Dict:
-        """Post a message to a Slack channel"""
+    def post_message(self, channel: str, text: str, blocks: Optional[list] = None,
+                     thread_ts: Optional[str] = None) -> Dict:
+        """Post a message to a Slack channel, or as a reply in a thread when ``thread_ts`` is given"""
         payload = {
             "channel": channel,
             "text": text,
@@ -62,6 +134,8 @@ class SlackClient:
         
         if blocks:
             payload["blocks"] = blocks
+        if thread_ts:
+            payload["thread_ts"] = thread_ts
         
         try:
             response = self._make_request("POST", "chat.postMessage", json_data=payload)
@@ -71,6 +145,11 @@ class SlackClient:
             logger.error(f"Error posting message to Slack: {e}")
             raise
     
+    async def post_message_async(self, channel: str, text: str, blocks: Optional[list] = None,
+                                 thread_ts: Optional[str] = None) -> Dict:
+        """Async variant of post_message, so several posts can be in flight at once"""
+        return await asyncio.to_thread(self.post_message, channel, text, blocks, thread_ts)
+    
     def test_auth(self) -> bool:
         """Test the Slack authentication"""
         try:
@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import logging
+import sqlite3
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Delivery records older than this are dropped; the task snapshot and the outbox
+# dedupe keys cover anything older
+DELIVERY_RETENTION = 30 * 24 * 3600
+
+# (dedupe key, channel, task id) of one delivered notification
+DeliveryRecord = Tuple[str, str, str]
+
+
+class StateBackend(ABC):
+    """Persistent per-workspace watermarks and per-task delivery records"""
+
+    @abstractmethod
+    def get_watermark(self, workspace_id: str) -> Optional[datetime]:
+        ...
+
+    @abstractmethod
+    def set_watermark(self, workspace_id: str, timestamp: datetime):
+        ...
+
+    @abstractmethod
+    def watermark_updated_at(self, workspace_id: str) -> Optional[datetime]:
+        """When a workspace's watermark was last saved, i.e. its last successful poll"""
+
+    @abstractmethod
+    def record_deliveries(self, records: Iterable[DeliveryRecord]):
+        ...
+
+    @abstractmethod
+    def is_delivered(self, dedupe_key: str) -> bool:
+        ...
+
+    def close(self):
+        pass
+
+
+def atomic_write(path: Path, data: str):
+    """Replace a file so readers see either the old or the new contents, never a mix"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    # Persist the rename itself
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class JSONStateBackend(StateBackend):
+    """State kept in memory and written to a JSON file with atomic renames
+
+    The file is read once; every change rewrites it via a fsynced temporary
+    file and ``os.replace``, so a crash leaves the previous version intact.
+    """
+
+    def __init__(self, path: str = "state.json"):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.state = self._load()
+
+    def _load(self) -> Dict:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+        except ValueError as e:
+            # Only files written before atomic writes can be torn like this
+            corrupt = self.path.with_name(self.path.name + '.corrupt')
+            os.replace(self.path, corrupt)
+            logger.error(f"State file {self.path} is unreadable ({e}); moved it to {corrupt}")
+            return {}
+
+        if 'last_checked' in state:
+            # Single-workspace state written before routing existed; applies to
+            # any workspace without its own watermark
+            state['default_last_checked'] = state.pop('last_checked')
+        return state
+
+    def _save(self):
+        atomic_write(self.path, json.dumps(self.state))
+
+    def get_watermark(self, workspace_id: str) -> Optional[datetime]:
+        with self.lock:
+            workspace_state = self.state.get('workspaces', {}).get(workspace_id)
+            value = workspace_state['last_checked'] if workspace_state else self.state.get('default_last_checked')
+        return datetime.fromisoformat(value) if value else None
+
+    def watermark_updated_at(self, workspace_id: str) -> Optional[datetime]:
+        with self.lock:
+            workspace_state = self.state.get('workspaces', {}).get(workspace_id)
+            value = workspace_state.get('updated_at') if workspace_state else None
+        return datetime.fromisoformat(value) if value else None
+
+    def set_watermark(self, workspace_id: str, timestamp: datetime):
+        with self.lock:
+            self.state.setdefault('workspaces', {})[workspace_id] = {
+                'last_checked': timestamp.isoformat(),
+                'updated_at': datetime.now(timezone.utc).isoformat()
+            }
+            self._save()
+
+    def record_deliveries(self, records: Iterable[DeliveryRecord]):
+        now = time.time()
+        with self.lock:
+            deliveries = self.state.setdefault('deliveries', {})
+            for dedupe_key, channel, task_id in records:
+                deliveries[dedupe_key] = now
+            cutoff = now - DELIVERY_RETENTION
+            for dedupe_key in [key for key, delivered_at in deliveries.items() if delivered_at < cutoff]:
+                del deliveries[dedupe_key]
+            self._save()
+
+    def is_delivered(self, dedupe_key: str) -> bool:
+        with self.lock:
+            return dedupe_key in self.state.get('deliveries', {})
+
+
+class SQLiteStateBackend(StateBackend):
+    """State in SQLite, so each write touches a row instead of the whole file"""
+
+    def __init__(self, path: str = "state.db"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS watermarks (
+                workspace_id TEXT PRIMARY KEY,
+                last_checked TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS deliveries (
+                dedupe_key TEXT PRIMARY KEY,
+                channel TEXT NOT NULL,
+                task_id TEXT,
+                delivered_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_deliveries_delivered_at ON deliveries (delivered_at)"
+        )
+        self.conn.commit()
+
+    def get_watermark(self, workspace_id: str) -> Optional[datetime]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT last_checked FROM watermarks WHERE workspace_id = ?", (workspace_id,)
+            ).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def watermark_updated_at(self, workspace_id: str) -> Optional[datetime]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT updated_at FROM watermarks WHERE workspace_id = ?", (workspace_id,)
+            ).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def set_watermark(self, workspace_id: str, timestamp: datetime):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO watermarks (workspace_id, last_checked, updated_at) VALUES (?, ?, ?)",
+                (workspace_id, timestamp.isoformat(), datetime.now(timezone.utc).isoformat())
+            )
+
+    def record_deliveries(self, records: Iterable[DeliveryRecord]):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO deliveries (dedupe_key, channel, task_id, delivered_at) "
+                "VALUES (?, ?, ?, ?)",
+                [(dedupe_key, channel, task_id, now) for dedupe_key, channel, task_id in records]
+            )
+            self.conn.execute(
+                "DELETE FROM deliveries WHERE delivered_at < ?", (now - DELIVERY_RETENTION,)
+            )
+
+    def is_delivered(self, dedupe_key: str) -> bool:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM deliveries WHERE dedupe_key = ?", (dedupe_key,)
+            ).fetchone()
+        return row is not None
+
+    def close(self):
+        self.conn.close()
+
+
+def open_state_backend(kind: Optional[str] = None, path: Optional[str] = None) -> StateBackend:
+    """Open the backend chosen by STATE_BACKEND ('json' or 'sqlite') and STATE_PATH"""
+    kind = (kind or os.environ.get('STATE_BACKEND', 'json')).lower()
+    path = path or os.environ.get('STATE_PATH')
+    if kind == 'sqlite':
+        return SQLiteStateBackend(path or 'state.db')
+    if kind == 'json':
+        return JSONStateBackend(path or 'state.json')
+    raise ValueError(f"Unknown STATE_BACKEND: {kind}")
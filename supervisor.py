@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+import signal
+import bisect
+import hashlib
+import logging
+import multiprocessing
+from typing import Dict, Iterable, List
+
+from leases import default_owner
+
+logger = logging.getLogger(__name__)
+
+# Crashed workers are restarted after a delay that doubles up to this cap
+MAX_RESTART_DELAY = 60
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent hash ring mapping keys to nodes
+
+    Each node gets ``replicas`` points on the ring, so adding or removing a
+    node only moves the keys between it and its neighbours.
+    """
+
+    def __init__(self, nodes: Iterable[str], replicas: int = 64):
+        self.ring = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas))
+        self.points = [point for point, _ in self.ring]
+
+    def node_for(self, key: str) -> str:
+        index = bisect.bisect(self.points, _hash(key)) % len(self.ring)
+        return self.ring[index][1]
+
+
+def shard_workspaces(workspace_ids: Iterable[str], count: int) -> Dict[int, List[str]]:
+    """Assign workspaces to ``count`` workers; workers left without any are omitted"""
+    ring = HashRing(str(index) for index in range(count))
+    shards = {}
+    for workspace_id in sorted(workspace_ids):
+        shards.setdefault(int(ring.node_for(workspace_id)), []).append(workspace_id)
+    return shards
+
+
+def _exit_on_sigterm(signum, frame):
+    # Unwinds through finally blocks so leases are released on shutdown
+    sys.exit(0)
+
+
+def run_worker(index: int, workspace_ids: List[str]):
+    """Worker process entry point: poll one shard of workspaces"""
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+    from main import MotionSlackIntegration, configure_logging
+
+    # Spawned workers start from a fresh interpreter that hasn't run main.main()
+    configure_logging()
+    integration = MotionSlackIntegration()
+    integration.own_workspaces(workspace_ids)
+    logger.info(f"Worker {index} (pid {os.getpid()}) polling workspaces: {', '.join(workspace_ids)}")
+    if integration.watchdog:
+        # A hung worker exits and is restarted by the supervisor
+        integration.heartbeats.watch()
+    try:
+        integration.poll_loop()
+    finally:
+        integration.leases.release_all()
+
+
+class Supervisor:
+    """Runs workspace polling in worker processes and restarts them when they die
+
+    Workers only poll; the supervisor's own integration delivers the shared
+    outbox and serves HTTP. All processes coordinate through SQLite leases in
+    LEASE_DB on the local disk.
+    """
+
+    def __init__(self, workers: int):
+        os.environ.setdefault('LEASE_DB', 'leases.db')
+        # Every process writes watermarks, which a per-process JSON file would clobber
+        state_backend = os.environ.setdefault('STATE_BACKEND', 'sqlite').lower()
+        if state_backend != 'sqlite':
+            raise ValueError(f"WORKERS > 1 needs STATE_BACKEND=sqlite, not {state_backend}")
+
+        from main import MotionSlackIntegration
+
+        self.integration = MotionSlackIntegration()
+        self.shards = shard_workspaces(self.integration.workspaces, workers)
+        # Motion's quota is per API key: split it so the workers together stay within it
+        share = len(self.shards) or 1
+        os.environ['MOTION_RATE_LIMIT'] = str(float(os.environ.get('MOTION_RATE_LIMIT', 12)) / share)
+        os.environ['MOTION_RATE_BURST'] = str(max(float(os.environ.get('MOTION_RATE_BURST', 3)) / share, 1))
+        # Spawned rather than forked: the supervisor runs threads of its own
+        self.context = multiprocessing.get_context('spawn')
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.started_at: Dict[int, float] = {}
+        self.restart_delay: Dict[int, float] = {}
+        self.restart_at: Dict[int, float] = {}
+
+    def start_worker(self, index: int):
+        process = self.context.Process(
+            target=run_worker, args=(index, self.shards[index]), name=f"worker-{index}", daemon=True
+        )
+        process.start()
+        self.processes[index] = process
+        self.started_at[index] = time.monotonic()
+        self.restart_at.pop(index, None)
+
+    def check_workers(self):
+        """Schedule restarts for dead workers and start those whose delay has passed"""
+        now = time.monotonic()
+        for index, process in self.processes.items():
+            if index in self.restart_at or process.is_alive():
+                continue
+            # A worker that ran for a while before dying restarts quickly again
+            if now - self.started_at[index] > MAX_RESTART_DELAY:
+                self.restart_delay[index] = 1
+            else:
+                self.restart_delay[index] = min(self.restart_delay.get(index, 0.5) * 2, MAX_RESTART_DELAY)
+            self.restart_at[index] = now + self.restart_delay[index]
+            # Its workspaces can be taken over at once instead of after the lease TTL
+            self.integration.leases.release_all(owner=default_owner(process.pid))
+            logger.error(
+                f"Worker {index} exited with code {process.exitcode}; "
+                f"restarting in {self.restart_delay[index]:.0f}s"
+            )
+        for index, restart_at in list(self.restart_at.items()):
+            if restart_at <= now:
+                self.start_worker(index)
+
+    def stop(self):
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes.values():
+            process.join(10)
+        self.integration.leases.release_all()
+
+    def run(self):
+        integration = self.integration
+        logger.info(
+            f"Supervising {len(self.shards)} worker processes for {len(integration.workspaces)} workspaces "
+            f"(leases in {integration.leases.path}, {integration.leases.ttl:.0f}s TTL)"
+        )
+        signal.signal(signal.SIGTERM, _exit_on_sigterm)
+        for index in self.shards:
+            self.start_worker(index)
+        integration.start_delivery_worker()
+        integration.start_http_server()
+        if integration.watchdog:
+            integration.heartbeats.watch()
+
+        try:
+            while True:
+                integration.heartbeats.beat('supervisor', 1)
+                time.sleep(1)
+                self.check_workers()
+        except KeyboardInterrupt:
+            logger.info("Shutting down...")
+        finally:
+            self.stop()
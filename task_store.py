@@ -0,0 +1,260 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from fast_json import plain
+from timeutil import parse_timestamp, to_epoch_ms
+
+logger = logging.getLogger(__name__)
+
+# Transition kinds emitted by TaskStore.diff
+COMPLETED = "completed"
+REOPENED = "reopened"
+RECOMPLETED = "recompleted"
+
+# SQLite's default limit on bound parameters is 999
+LOOKUP_BATCH = 500
+
+
+def content_hash(task: Dict) -> str:
+    """Stable hash of a task payload, used to skip unchanged tasks"""
+    encoded = json.dumps(plain(task), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+class TaskStore:
+    """On-disk snapshot of every task seen, diffed against each poll"""
+
+    def __init__(self, path: str = "tasks.db"):
+        self.path = path
+        # Workspaces may be polled from several threads; serialise access
+        self.lock = threading.Lock()
+        # Worker processes share the file: WAL lets readers run alongside a writer
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                workspace_id TEXT NOT NULL,
+                status TEXT,
+                completed INTEGER NOT NULL DEFAULT 0,
+                completed_time TEXT,
+                updated_time TEXT,
+                content_hash TEXT NOT NULL,
+                times_completed INTEGER NOT NULL DEFAULT 0,
+                completed_epoch INTEGER
+            )
+        """)
+        self._migrate()
+        self._create_bootstraps()
+        # Completion-time index: watermark and range queries never scan the table
+        self.conn.execute("DROP INDEX IF EXISTS idx_tasks_workspace_completed")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tasks_completed_epoch "
+            "ON tasks (workspace_id, completed, completed_epoch)"
+        )
+        self.conn.commit()
+
+    def _migrate(self):
+        """Add the completed_epoch column to snapshots created before it existed"""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(tasks)")}
+        if "completed_epoch" in columns:
+            return
+        self.conn.execute("ALTER TABLE tasks ADD COLUMN completed_epoch INTEGER")
+        rows = self.conn.execute(
+            "SELECT id, completed_time FROM tasks WHERE completed_time IS NOT NULL"
+        ).fetchall()
+        self.conn.executemany(
+            "UPDATE tasks SET completed_epoch = ? WHERE id = ?",
+            [(parse_timestamp(completed_time), task_id) for task_id, completed_time in rows]
+        )
+        logger.info(f"Indexed completion times of {len(rows)} snapshot tasks")
+
+    def _create_bootstraps(self):
+        """Track which workspaces have finished a full bootstrap scan"""
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bootstraps'"
+        ).fetchone()
+        if exists:
+            return
+        self.conn.execute("""
+            CREATE TABLE bootstraps (
+                workspace_id TEXT PRIMARY KEY,
+                completed_at REAL NOT NULL
+            )
+        """)
+        # Snapshots from before the table existed only had rows once bootstrapped
+        self.conn.execute(
+            "INSERT INTO bootstraps (workspace_id, completed_at) "
+            "SELECT DISTINCT workspace_id, strftime('%s', 'now') FROM tasks"
+        )
+
+    def is_bootstrapped(self, workspace_id: str) -> bool:
+        """Whether a full scan of a workspace has ever completed
+
+        Until one has, pages recorded by an interrupted scan (or a backfill)
+        don't make never-seen tasks count as new completions.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM bootstraps WHERE workspace_id = ?", (workspace_id,)
+            ).fetchone()
+        return row is not None
+
+    def mark_bootstrapped(self, workspace_id: str):
+        """Record that a full scan of a workspace completed"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO bootstraps (workspace_id, completed_at) VALUES (?, ?)",
+                (workspace_id, time.time())
+            )
+
+    def is_empty(self, workspace_id: str) -> bool:
+        """Whether nothing has been recorded for a workspace yet"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM tasks WHERE workspace_id = ? LIMIT 1", (workspace_id,)
+            ).fetchone()
+        return row is None
+
+    def count(self, workspace_id: str) -> int:
+        """Number of tasks recorded for a workspace"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE workspace_id = ?", (workspace_id,)
+            ).fetchone()[0]
+
+    def latest_completed_epoch(self, workspace_id: str) -> Optional[int]:
+        """Most recent completion time recorded for a workspace, in epoch ms"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT MAX(completed_epoch) FROM tasks WHERE workspace_id = ? AND completed = 1",
+                (workspace_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def completed_between(self, workspace_id: str, start: int, end: int) -> List[str]:
+        """Ids of tasks completed in [start, end), epoch ms, oldest first"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id FROM tasks WHERE workspace_id = ? AND completed = 1 "
+                "AND completed_epoch >= ? AND completed_epoch < ? ORDER BY completed_epoch",
+                (workspace_id, start, end)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _lookup(self, task_ids: List[str]) -> Dict[str, Tuple]:
+        """Fetch the snapshot rows for a page of tasks in a few queries"""
+        rows = {}
+        for offset in range(0, len(task_ids), LOOKUP_BATCH):
+            batch = task_ids[offset:offset + LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for row in self.conn.execute(
+                "SELECT id, completed, completed_time, updated_time, content_hash, times_completed "
+                f"FROM tasks WHERE id IN ({placeholders})",
+                batch
+            ):
+                rows[row[0]] = row[1:]
+        return rows
+
+    def diff(self, workspace_id: str, tasks: Iterable[Dict],
+             bootstrap_since: Optional[datetime] = None,
+             bootstrapping: Optional[bool] = None,
+             on_transitions: Optional[Callable[[List[Tuple[str, Dict]]], None]] = None
+             ) -> List[Tuple[str, Dict]]:
+        """Record the given tasks and return the transitions since the last snapshot
+
+        Tasks that were never seen before only count as newly completed once
+        a full scan of the workspace has completed. Until then, unseen tasks
+        are reported only if completed after ``bootstrap_since``. Callers
+        diffing a scan page by page should check ``is_bootstrapped`` once up
+        front, pass its negation as ``bootstrapping`` for every page and call
+        ``mark_bootstrapped`` once the full scan finishes.
+        ``on_transitions`` runs before the snapshot is committed; if it raises,
+        the snapshot is rolled back so the same transitions are found again.
+
+        Tasks whose completion state and updatedTime match the snapshot are
+        skipped without hashing or parsing anything, so the work done per poll
+        is proportional to the tasks that changed.
+        """
+        if bootstrapping is None:
+            bootstrapping = not self.is_bootstrapped(workspace_id)
+        since_epoch = to_epoch_ms(bootstrap_since) if bootstrap_since else None
+        tasks = [task for task in tasks if task.get("id")]
+        transitions = []
+
+        with self.lock, self.conn:
+            known = self._lookup([task["id"] for task in tasks])
+            updates = []
+
+            for task in tasks:
+                task_id = task["id"]
+                completed = bool(task.get("completed"))
+                completed_time = task.get("completedTime")
+                updated_time = task.get("updatedTime")
+                row = known.get(task_id)
+
+                if (row and bool(row[0]) == completed and row[1] == completed_time
+                        and updated_time and row[2] == updated_time):
+                    continue
+
+                digest = content_hash(task)
+                if row and row[3] == digest:
+                    continue
+
+                completed_epoch = parse_timestamp(completed_time)
+                times_completed = row[4] if row else 0
+                kind = None
+
+                if row is None:
+                    if completed and (not bootstrapping or (
+                            since_epoch is not None and completed_epoch is not None
+                            and completed_epoch > since_epoch)):
+                        kind = COMPLETED
+                else:
+                    was_completed, previous_time = bool(row[0]), row[1]
+                    if completed and not was_completed:
+                        kind = RECOMPLETED if times_completed else COMPLETED
+                    elif was_completed and not completed:
+                        kind = REOPENED
+                    elif completed and completed_time and completed_time != previous_time:
+                        # Reopened and completed again between two polls
+                        kind = RECOMPLETED
+
+                if kind in (COMPLETED, RECOMPLETED) or (row is None and completed):
+                    times_completed += 1
+                if kind:
+                    transitions.append((kind, task))
+
+                updates.append((
+                    task_id,
+                    workspace_id,
+                    (task.get("status") or {}).get("name"),
+                    int(completed),
+                    completed_time,
+                    updated_time,
+                    digest,
+                    times_completed,
+                    completed_epoch,
+                ))
+
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO tasks (id, workspace_id, status, completed, "
+                "completed_time, updated_time, content_hash, times_completed, completed_epoch) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                updates
+            )
+
+            if on_transitions and transitions:
+                on_transitions(transitions)
+
+        return transitions
+
+    def close(self):
+        """Close the underlying database connection"""
+        self.conn.close()
@@ -0,0 +1,15 @@
+"""
+Regression checks for the description HTML to Slack mrkdwn converter
+"""
+
+from mrkdwn import html_to_mrkdwn
+
+
+def test_paragraphs_inside_list_items_stay_on_the_bullet_line():
+    html = "<ul><li><p>First item</p></li><li><p>Second</p></li></ul>"
+    assert html_to_mrkdwn(html) == "• First item\n• Second"
+    assert html_to_mrkdwn("<ul>\n  <li>\n    <p>First</p>\n  </li>\n</ul>") == "• First"
+
+
+def test_paragraph_inside_blockquote_stays_on_the_quote_line():
+    assert html_to_mrkdwn("<blockquote><p>quote</p></blockquote>") == "> quote"
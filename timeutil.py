@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Optional
+
+
+@lru_cache(maxsize=65536)
+def parse_timestamp(value: Optional[str]) -> Optional[int]:
+    """Parse a Motion ISO 8601 timestamp into epoch milliseconds
+
+    Cached so each distinct completedTime string is parsed once per
+    process, however many polls it shows up in.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def to_epoch_ms(value: datetime) -> int:
+    """Convert an aware datetime to epoch milliseconds"""
+    return int(value.timestamp() * 1000)
+
+
+def from_epoch_ms(value: int) -> datetime:
+    """Convert epoch milliseconds to an aware UTC datetime"""
+    return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
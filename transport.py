@@ -0,0 +1,142 @@
+import os
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TransportConfig:
+    """Connection pooling and timeout settings shared by the API clients"""
+    pool_size: int = 20
+    connect_timeout: float = 5.0
+    read_timeout: float = 20.0
+    http2: bool = False
+
+    @classmethod
+    def from_env(cls) -> 'TransportConfig':
+        return cls(
+            pool_size=int(os.environ.get('HTTP_POOL_SIZE', 20)),
+            connect_timeout=float(os.environ.get('HTTP_CONNECT_TIMEOUT', 5)),
+            read_timeout=float(os.environ.get('HTTP_READ_TIMEOUT', 20)),
+            http2=os.environ.get('HTTP2', 'false').lower() == 'true',
+        )
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """(connect, read) timeout in the form requests expects"""
+        return self.connect_timeout, self.read_timeout
+
+
+# Sent on every request; connections are pooled and reused between calls
+DEFAULT_HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+
+class HTTPXResponse:
+    """Wrap an httpx response in the parts of the requests API the clients use"""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+
+    @property
+    def content(self) -> bytes:
+        return self._response.content
+
+    @property
+    def text(self) -> str:
+        return self._response.text
+
+    def json(self) -> Any:
+        return self._response.json()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            kind = "Client" if self.status_code < 500 else "Server"
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} {kind} Error: {self._response.reason_phrase} for url: {self.url}",
+                response=self
+            )
+
+
+class HTTPXSession:
+    """requests.Session look-alike backed by an HTTP/2 capable httpx client
+
+    Transport errors are translated to the requests exceptions the clients'
+    retry loops already handle.
+    """
+
+    def __init__(self, config: TransportConfig):
+        import httpx
+
+        self.httpx = httpx
+        self.headers = {}
+        self.client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=config.pool_size,
+                max_keepalive_connections=config.pool_size
+            ),
+            timeout=httpx.Timeout(config.read_timeout, connect=config.connect_timeout),
+        )
+
+    def request(self, method: str, url: str, params: Optional[Dict] = None, json: Any = None,
+                headers: Optional[Dict] = None, timeout: Optional[Tuple[float, float]] = None):
+        merged = dict(self.headers)
+        merged.update(headers or {})
+        kwargs = {}
+        if timeout is not None:
+            connect, read = timeout
+            kwargs["timeout"] = self.httpx.Timeout(read, connect=connect)
+        try:
+            response = self.client.request(method, url, params=params, json=json, headers=merged, **kwargs)
+        except self.httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except self.httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        except self.httpx.HTTPError as e:
+            raise requests.exceptions.RequestException(str(e)) from e
+        return HTTPXResponse(response)
+
+    def close(self):
+        self.client.close()
+
+
+def build_session(config: Optional[TransportConfig] = None, headers: Optional[Dict[str, str]] = None):
+    """Create a pooled session for one API client
+
+    With ``http2`` the httpx backend is used when httpx and h2 are installed;
+    otherwise, or if they are missing, a requests session with a pool sized
+    for the configured concurrency.
+    """
+    config = config or TransportConfig.from_env()
+    session = None
+    if config.http2:
+        try:
+            session = HTTPXSession(config)
+        except ImportError as e:
+            logger.warning(f"HTTP/2 requested but unavailable ({e}); install httpx[http2]. Using HTTP/1.1")
+
+    if session is None:
+        session = requests.Session()
+        # Retries are handled by the clients, which know about rate limits
+        adapter = HTTPAdapter(
+            pool_connections=config.pool_size,
+            pool_maxsize=config.pool_size,
+            max_retries=0
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+    session.headers.update(DEFAULT_HEADERS)
+    session.headers.update(headers or {})
+    return session
@@ -0,0 +1,71 @@
+import hmac
+import json
+import hashlib
+import logging
+from typing import Callable, Dict, Optional, Tuple
+
+from http_server import json_response
+
+logger = logging.getLogger(__name__)
+
+
+def sign(secret: str, body: bytes) -> str:
+    """HMAC-SHA256 signature of a request body, hex encoded"""
+    return hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(secret: str, body: bytes, signature: Optional[str]) -> bool:
+    """Check a signature header, accepting an optional ``sha256=`` prefix"""
+    if not signature:
+        return False
+    if signature.startswith("sha256="):
+        signature = signature[len("sha256="):]
+    return hmac.compare_digest(sign(secret, body), signature.strip())
+
+
+def extract_task(payload: Dict) -> Optional[Dict]:
+    """Pull the task object out of a webhook payload
+
+    Accepts ``{"task": {...}}``, ``{"data": {...}}`` (optionally wrapping
+    ``task``) or a bare task object.
+    """
+    if not isinstance(payload, dict):
+        return None
+    task = payload.get("task") or payload.get("data") or payload
+    if isinstance(task, dict) and isinstance(task.get("task"), dict):
+        task = task["task"]
+    if not isinstance(task, dict) or not task.get("id"):
+        return None
+    return task
+
+
+class WebhookReceiver:
+    """Validates Motion task webhooks and hands the task to a callback"""
+
+    def __init__(self, secret: str, on_task: Callable[[Dict], bool],
+                 signature_header: str = "X-Motion-Signature"):
+        self.secret = secret
+        self.on_task = on_task
+        self.signature_header = signature_header.lower()
+
+    def handle(self, body: bytes, headers: Dict[str, str]) -> Tuple[int, str, bytes]:
+        """Handle one webhook request"""
+        signature = next(
+            (value for key, value in headers.items() if key.lower() == self.signature_header),
+            None
+        )
+        if not verify_signature(self.secret, body, signature):
+            logger.warning("Rejected webhook with a missing or invalid signature")
+            return json_response(401, {"error": "invalid signature"})
+
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError:
+            return json_response(400, {"error": "invalid JSON"})
+
+        task = extract_task(payload)
+        if task is None:
+            return json_response(400, {"error": "no task in payload"})
+
+        accepted = self.on_task(task)
+        return json_response(202 if accepted else 200, {"accepted": bool(accepted)})